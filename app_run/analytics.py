@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Max, Sum
+
+from app_run import versions
+from app_run.models import AthleteStats, Run, Subscribe
+
+LEADERS = ('longest_run', 'total_run', 'speed_avg')
+
+
+def coach_analytics_resource(coach_id):
+    return f'coach_analytics:{coach_id}'
+
+
+def get_analytics_version(coach_id):
+    version, updated_at = versions.get_state(coach_analytics_resource(coach_id))
+    return f'{version}-{updated_at.timestamp() if updated_at else 0}'
+
+
+def clear_coach_analytics(*coach_ids):
+    versions.bump(*map(coach_analytics_resource, coach_ids))
+
+
+def clear_athlete_coaches_analytics(athlete_id):
+    coach_ids = list(Subscribe.objects.filter(athlete_id=athlete_id).values_list('coach_id', flat=True))
+    if coach_ids:
+        clear_coach_analytics(*coach_ids)
+
+
+def athlete_totals(coach_id, start=None, end=None):
+    athlete_ids = Subscribe.objects.filter(coach_id=coach_id).values('athlete_id')
+    if start is None and end is None:
+        return AthleteStats.objects.filter(athlete_id__in=athlete_ids).values_list(
+            'athlete_id', 'longest_run', 'total_distance', 'avg_speed'
+        )
+    runs = Run.objects.filter(athlete_id__in=athlete_ids, status='finished')
+    if start is not None:
+        runs = runs.filter(created_at__gte=start)
+    if end is not None:
+        runs = runs.filter(created_at__lt=end)
+    return runs.values('athlete').annotate(
+        longest_run=Max('distance'), total_distance=Sum('distance'), avg_speed=Avg('speed')
+    ).order_by().values_list('athlete', 'longest_run', 'total_distance', 'avg_speed')
+
+
+def get_leaders(rows):
+    analytics = {}
+    for index, name in enumerate(LEADERS, start=1):
+        leader = max(
+            (row for row in rows if row[index] is not None), key=lambda row: (row[index], -row[0]), default=None
+        )
+        analytics[f'{name}_user'] = leader[0] if leader else None
+        analytics[f'{name}_value'] = round(leader[index], 2) if leader else None
+    return analytics
+
+
+def get_coach_analytics(coach_id, start=None, end=None):
+    key = ':'.join([
+        'coach_analytics', str(coach_id), str(get_analytics_version(coach_id)),
+        start.isoformat() if start else '', end.isoformat() if end else ''
+    ])
+    analytics = cache.get(key)
+    if analytics is None:
+        analytics = get_leaders(list(athlete_totals(coach_id, start, end)))
+        cache.set(key, analytics, settings.COACH_ANALYTICS_TIMEOUT)
+    return analytics
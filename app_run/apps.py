@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AppRunConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app_run'
+
+    def ready(self):
+        from app_run import signals  # noqa: F401
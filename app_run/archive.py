@@ -0,0 +1,79 @@
+import struct
+import zlib
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from app_run import geo
+from app_run.models import Position, RunTrack
+
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<BI')
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+COORDINATE_SCALE = 10 ** 4
+SPEED_SCALE = 10 ** 2
+DISTANCE_SCALE = 10 ** 5
+TRACK_FIELDS = ('id', 'latitude', 'longitude', 'date_time', 'speed', 'distance')
+
+
+def pack_track(rows):
+    columns = [[] for _ in TRACK_FIELDS]
+    for position_id, latitude, longitude, date_time, speed, distance in rows:
+        columns[0].append(position_id)
+        columns[1].append(round(latitude * COORDINATE_SCALE))
+        columns[2].append(round(longitude * COORDINATE_SCALE))
+        columns[3].append((date_time - EPOCH) // timedelta(microseconds=1))
+        columns[4].append(round(speed * SPEED_SCALE))
+        columns[5].append(round(distance * DISTANCE_SCALE))
+    body = b''.join(np.diff(np.array(column, dtype='<i8'), prepend=0).astype('<i8').tobytes() for column in columns)
+    return HEADER.pack(FORMAT_VERSION, len(columns[0])) + zlib.compress(body)
+
+
+def unpack_track(data):
+    version, count = HEADER.unpack_from(data)
+    if version != FORMAT_VERSION:
+        raise ValueError(f'Unsupported track format version: {version}.')
+    body = np.frombuffer(zlib.decompress(bytes(data[HEADER.size:])), dtype='<i8')
+    ids, latitudes, longitudes, timestamps, speeds, distances = (
+        np.cumsum(column).tolist() for column in body.reshape(len(TRACK_FIELDS), count)
+    )
+    for row in zip(ids, latitudes, longitudes, timestamps, speeds, distances):
+        position_id, latitude, longitude, timestamp, speed, distance = row
+        yield (
+            position_id,
+            Decimal(latitude).scaleb(-4),
+            Decimal(longitude).scaleb(-4),
+            EPOCH + timedelta(microseconds=timestamp),
+            speed / SPEED_SCALE,
+            distance / DISTANCE_SCALE
+        )
+
+
+def iter_track(run_id, chunk_size=2000):
+    track = RunTrack.objects.filter(run_id=run_id).values_list('data', flat=True).first()
+    if track is not None:
+        return unpack_track(track)
+    return Position.objects.filter(run_id=run_id).order_by('date_time', 'id').values_list(
+        *TRACK_FIELDS
+    ).iterator(chunk_size=chunk_size)
+
+
+def track_positions(run_id, rows):
+    return [Position(run_id=run_id, **dict(zip(TRACK_FIELDS, row))) for row in rows]
+
+
+def simplified_track(run, tolerance):
+    key = f'run_track:{run.id}:{tolerance:g}'
+    rows = cache.get(key) if run.status == 'finished' else None
+    if rows is None:
+        rows = list(iter_track(run.id))
+        if rows:
+            _, latitudes, longitudes, *_ = zip(*rows)
+            rows = [rows[index] for index in geo.simplify(latitudes, longitudes, tolerance)]
+        if run.status == 'finished':
+            cache.set(key, rows, settings.SIMPLIFIED_TRACK_TIMEOUT)
+    return rows
@@ -0,0 +1,109 @@
+import operator
+from itertools import groupby
+
+from django.conf import settings
+from django.core.cache import cache
+
+from app_run import versions
+from app_run.models import Challenge
+
+SUMMARY_CACHE_KEY = 'challenges_summary'
+
+LOOKUPS = {
+    'exact': operator.eq,
+    'gt': operator.gt,
+    'gte': operator.ge,
+    'lt': operator.lt,
+    'lte': operator.le
+}
+RUN_FIELDS = {
+    'run_distance': 'distance',
+    'run_time_seconds': 'run_time_seconds',
+    'run_speed': 'speed'
+}
+
+
+class ChallengeRule:
+    def __init__(self, full_name, **conditions):
+        self.full_name = full_name
+        self.conditions = []
+        for condition, value in conditions.items():
+            metric, lookup = condition.rsplit('__', 1)
+            if lookup not in LOOKUPS:
+                raise ValueError(f'Unsupported lookup "{lookup}" in challenge "{full_name}".')
+            self.conditions.append((metric, lookup, value))
+
+    def matches(self, metrics, ignore=()):
+        return all(
+            metrics.get(metric) is not None and LOOKUPS[lookup](metrics[metric], value)
+            for metric, lookup, value in self.conditions if metric not in ignore
+        )
+
+    def run_filter(self):
+        return {
+            f'{RUN_FIELDS[metric]}__{lookup}': value
+            for metric, lookup, value in self.conditions if metric in RUN_FIELDS
+        }
+
+
+rules = []
+
+
+def register(full_name, **conditions):
+    rules.append(ChallengeRule(full_name, **conditions))
+
+
+register('Сделай 10 Забегов!', runs_finished__gte=10)
+register('Пробеги 50 километров!', total_distance__gte=50)
+register('2 километра за 10 минут!', run_distance__gte=2, run_time_seconds__lte=600)
+
+
+def get_metrics(stats, run=None):
+    metrics = {
+        'runs_finished': stats.runs_finished,
+        'total_distance': stats.total_distance
+    }
+    if run:
+        metrics.update({
+            'run_distance': run.distance,
+            'run_time_seconds': run.run_time_seconds,
+            'run_speed': run.speed
+        })
+    return metrics
+
+
+def award_challenges(athlete_id, metrics):
+    challenges = [Challenge(athlete_id=athlete_id, full_name=rule.full_name) for rule in rules if rule.matches(metrics)]
+    if challenges:
+        Challenge.objects.bulk_create(challenges, ignore_conflicts=True)
+        clear_challenges_summary()
+
+
+def clear_challenges_summary():
+    versions.bump(versions.CHALLENGES)
+
+
+def get_challenges_summary(state=None):
+    version, updated_at = state or versions.get_state(versions.CHALLENGES)
+    key = f'{SUMMARY_CACHE_KEY}:{version}:{updated_at.timestamp() if updated_at else 0}'
+    summary = cache.get(key)
+    if summary is None:
+        rows = Challenge.objects.order_by('full_name', 'athlete_id').values_list(
+            'full_name', 'athlete_id', 'athlete__first_name', 'athlete__last_name', 'athlete__username'
+        ).iterator(chunk_size=2000)
+        summary = [
+            {
+                'name_to_display': full_name,
+                'athletes': [
+                    {
+                        'id': athlete_id,
+                        'full_name': ' '.join([first_name, last_name]) if first_name and last_name else '',
+                        'username': username
+                    }
+                    for _, athlete_id, first_name, last_name, username in group
+                ]
+            }
+            for full_name, group in groupby(rows, key=lambda row: row[0])
+        ]
+        cache.set(key, summary, settings.CHALLENGES_SUMMARY_TIMEOUT)
+    return summary
@@ -0,0 +1,104 @@
+import math
+
+import numpy as np
+from django.conf import settings
+from geopy.distance import distance as geodesic_distance
+
+EARTH_RADIUS = 6371008.8
+
+
+class GeodesicEngine:
+    def distance(self, point_a, point_b):
+        return geodesic_distance(point_a, point_b).m
+
+    def segments(self, latitudes, longitudes):
+        points = list(zip(map(float, latitudes), map(float, longitudes)))
+        return np.array([self.distance(point_a, point_b) for point_a, point_b in zip(points, points[1:])], dtype=float)
+
+
+class HaversineEngine(GeodesicEngine):
+    def distance(self, point_a, point_b):
+        latitude_a, longitude_a = map(math.radians, map(float, point_a))
+        latitude_b, longitude_b = map(math.radians, map(float, point_b))
+        a = (math.sin((latitude_b - latitude_a) / 2) ** 2
+             + math.cos(latitude_a) * math.cos(latitude_b) * math.sin((longitude_b - longitude_a) / 2) ** 2)
+        return 2 * EARTH_RADIUS * math.asin(math.sqrt(min(a, 1)))
+
+
+class NumpyHaversineEngine(HaversineEngine):
+    def segments(self, latitudes, longitudes):
+        latitudes = np.radians(np.asarray(latitudes, dtype=float))
+        longitudes = np.radians(np.asarray(longitudes, dtype=float))
+        d_latitude = np.diff(latitudes)
+        d_longitude = np.diff(longitudes)
+        a = np.sin(d_latitude / 2) ** 2 + np.cos(latitudes[:-1]) * np.cos(latitudes[1:]) * np.sin(d_longitude / 2) ** 2
+        return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+class NumpyEquirectangularEngine(GeodesicEngine):
+    def distance(self, point_a, point_b):
+        latitude_a, longitude_a = map(math.radians, map(float, point_a))
+        latitude_b, longitude_b = map(math.radians, map(float, point_b))
+        d_longitude = (longitude_b - longitude_a + math.pi) % (2 * math.pi) - math.pi
+        x = d_longitude * math.cos((latitude_a + latitude_b) / 2)
+        return EARTH_RADIUS * math.hypot(x, latitude_b - latitude_a)
+
+    def segments(self, latitudes, longitudes):
+        latitudes = np.radians(np.asarray(latitudes, dtype=float))
+        longitudes = np.radians(np.asarray(longitudes, dtype=float))
+        d_longitude = (np.diff(longitudes) + np.pi) % (2 * np.pi) - np.pi
+        x = d_longitude * np.cos((latitudes[:-1] + latitudes[1:]) / 2)
+        return EARTH_RADIUS * np.hypot(x, np.diff(latitudes))
+
+
+ENGINES = {
+    'geodesic': GeodesicEngine(),
+    'haversine': HaversineEngine(),
+    'numpy_haversine': NumpyHaversineEngine(),
+    'numpy_equirectangular': NumpyEquirectangularEngine(),
+}
+
+
+def get_engine(name=None):
+    return ENGINES[name or settings.GEO_ENGINE]
+
+
+def distance(point_a, point_b):
+    return get_engine().distance(point_a, point_b)
+
+
+def segment_distances(latitudes, longitudes):
+    if len(latitudes) < 2:
+        return np.zeros(0)
+    return get_engine().segments(latitudes, longitudes)
+
+
+def simplify(latitudes, longitudes, tolerance):
+    count = len(latitudes)
+    if count < 3:
+        return list(range(count))
+    latitudes = np.radians(np.asarray(latitudes, dtype=float))
+    longitudes = np.radians(np.asarray(longitudes, dtype=float))
+    x = EARTH_RADIUS * longitudes * np.cos(latitudes.mean())
+    y = EARTH_RADIUS * latitudes
+    keep = np.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, count - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        px, py = x[start + 1:end] - x[start], y[start + 1:end] - y[start]
+        length = np.hypot(dx, dy)
+        if length:
+            distances = np.abs(dx * py - dy * px) / length
+        else:
+            distances = np.hypot(px, py)
+        index = int(distances.argmax())
+        if distances[index] > tolerance:
+            middle = start + 1 + index
+            keep[middle] = True
+            stack.append((start, middle))
+            stack.append((middle, end))
+    return np.flatnonzero(keep).tolist()
@@ -0,0 +1,168 @@
+import csv
+import io
+import re
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from app_run import versions
+from app_run.models import CollectibleItem, ImportJob
+from app_run.spatial import RESOURCE_NAME, collectible_item_index
+
+ITEM_COLUMNS = ('name', 'uid', 'value', 'latitude', 'longitude', 'picture')
+ITEM_FIELDS = ['name', 'latitude', 'longitude', 'picture', 'value']
+IMPORT_MODES = ('insert', 'upsert')
+IMPORT_COUNTS = ('created', 'updated', 'unchanged')
+URL_VALIDATOR = URLValidator()
+INTEGER_SUFFIX = re.compile(r'\.0*\s*$')
+
+
+def is_csv(uploaded_file):
+    content_type = getattr(uploaded_file, 'content_type', None)
+    return uploaded_file.name.lower().endswith('.csv') or content_type in ('text/csv', 'application/csv')
+
+
+def iter_rows(uploaded_file):
+    if is_csv(uploaded_file):
+        reader = csv.reader(io.TextIOWrapper(uploaded_file, encoding='utf-8-sig', newline=''))
+        next(reader, None)
+        yield from (tuple(row) for row in reader)
+        return
+    workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(min_row=2, values_only=True)
+    finally:
+        workbook.close()
+
+
+def clean_text(value, field):
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise ValueError(field)
+    value = str(value).strip()
+    if not value or len(value) > CollectibleItem._meta.get_field(field).max_length:
+        raise ValueError(field)
+    return value
+
+
+def clean_number(value, field, cast, minimum, maximum):
+    if isinstance(value, bool) or value is None:
+        raise ValueError(field)
+    if cast is int and isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError(field)
+        value = int(value)
+    if isinstance(value, str):
+        value = INTEGER_SUFFIX.sub('', value.strip()) if cast is int else value.strip()
+    number = cast(value)
+    if not minimum <= number <= maximum:
+        raise ValueError(field)
+    return number
+
+
+def clean_item(row):
+    if len(row) > len(ITEM_COLUMNS) and all(value is None or value == '' for value in row[len(ITEM_COLUMNS):]):
+        row = row[:len(ITEM_COLUMNS)]
+    if len(row) != len(ITEM_COLUMNS):
+        raise ValueError('columns')
+    name, uid, value, latitude, longitude, picture = row
+    picture = clean_text(picture, 'picture')
+    try:
+        URL_VALIDATOR(picture)
+    except ValidationError:
+        raise ValueError('picture')
+    return CollectibleItem(
+        name=clean_text(name, 'name'),
+        uid=clean_text(uid, 'uid'),
+        value=clean_number(value, 'value', int, 0, 32767),
+        latitude=clean_number(latitude, 'latitude', float, -90, 90),
+        longitude=clean_number(longitude, 'longitude', float, -180, 180),
+        picture=picture
+    )
+
+
+def iter_batches(uploaded_file, batch_size=None):
+    batch_size = batch_size or settings.COLLECTIBLE_ITEM_IMPORT_BATCH_SIZE
+    batch = []
+    for row in iter_rows(uploaded_file):
+        if not any(value is not None and value != '' for value in row):
+            continue
+        try:
+            batch.append((row, clean_item(row)))
+        except (TypeError, ValueError):
+            batch.append((row, None))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def save_items(batch, mode='insert'):
+    uids = {item.uid for _, item in batch if item is not None}
+    existing = CollectibleItem.objects.filter(uid__in=uids).values_list('uid', *ITEM_FIELDS)
+    current = {uid: values for uid, *values in existing}
+    counts, changed, errors = dict.fromkeys(IMPORT_COUNTS, 0), {}, []
+    for row, item in batch:
+        if item is None or (mode == 'insert' and item.uid in current):
+            errors.append(row)
+            continue
+        values = [getattr(item, field) for field in ITEM_FIELDS]
+        previous = current.get(item.uid)
+        if previous == values:
+            counts['unchanged'] += 1
+            continue
+        counts['created' if previous is None else 'updated'] += 1
+        current[item.uid] = values
+        changed[item.uid] = item
+    if mode == 'upsert':
+        CollectibleItem.objects.bulk_create(
+            changed.values(), update_conflicts=True, unique_fields=['uid'], update_fields=ITEM_FIELDS
+        )
+    else:
+        CollectibleItem.objects.bulk_create(changed.values())
+    if changed:
+        versions.bump(RESOURCE_NAME, versions.COLLECTIBLE_ITEMS)
+        transaction.on_commit(collectible_item_index.invalidate)
+    return counts, errors
+
+
+@transaction.atomic
+def import_items(uploaded_file, mode='insert', batch_size=None):
+    counts, errors = dict.fromkeys(IMPORT_COUNTS, 0), []
+    for batch in iter_batches(uploaded_file, batch_size):
+        batch_counts, batch_errors = save_items(batch, mode)
+        counts = {name: counts[name] + batch_counts[name] for name in IMPORT_COUNTS}
+        errors.extend(batch_errors)
+    return counts, errors
+
+
+def claim_import_job():
+    for job_id in ImportJob.objects.filter(status='pending').order_by('created_at', 'id').values_list('id', flat=True):
+        if ImportJob.objects.filter(pk=job_id, status='pending').update(status='processing', started_at=timezone.now()):
+            return ImportJob.objects.get(pk=job_id)
+    return None
+
+
+def process_import_job(job, batch_size=None):
+    try:
+        with job.file.open('rb') as uploaded_file:
+            for batch in iter_batches(uploaded_file, batch_size):
+                with transaction.atomic():
+                    counts, errors = save_items(batch, job.mode)
+                    job.errors.extend(errors)
+                    ImportJob.objects.filter(pk=job.pk).update(
+                        rows_processed=F('rows_processed') + len(batch), errors=job.errors,
+                        **{f'items_{name}': F(f'items_{name}') + count for name, count in counts.items()}
+                    )
+    except Exception as error:
+        ImportJob.objects.filter(pk=job.pk).update(status='failed', message=str(error), finished_at=timezone.now())
+    else:
+        job.file.delete(save=False)
+        ImportJob.objects.filter(pk=job.pk).update(status='finished', file='', finished_at=timezone.now())
+    job.refresh_from_db()
+    return job
@@ -0,0 +1,211 @@
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from app_run import geo, versions
+from app_run.models import CollectibleItem, PendingPosition, Position, Run
+from app_run.spatial import collectible_item_index
+
+
+class FixOrderError(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def run_state_key(run_id):
+    return f'run_state:{run_id}'
+
+
+def lock_run(run_id):
+    return Run.objects.select_for_update(of=('self',)).select_related('athlete').get(pk=run_id)
+
+
+def get_run_state(run):
+    cache = caches[settings.RUN_STATE_CACHE]
+    state = cache.get(run_state_key(run.id))
+    if state is None or state['revision'] != run.positions_revision:
+        position = run.positions.order_by('-date_time').values('latitude', 'longitude', 'date_time', 'distance').first()
+        if not position:
+            return None
+        state = {**position, 'revision': run.positions_revision}
+        cache.set(run_state_key(run.id), state, settings.RUN_STATE_TIMEOUT)
+    return state
+
+
+def save_run_state(run, position, previous=None):
+    if previous and position.date_time < previous['date_time']:
+        return
+    state = {
+        'latitude': position.latitude,
+        'longitude': position.longitude,
+        'date_time': position.date_time,
+        'distance': position.distance,
+        'revision': run.positions_revision + 1
+    }
+    transaction.on_commit(
+        lambda: caches[settings.RUN_STATE_CACHE].set(run_state_key(run.id), state, settings.RUN_STATE_TIMEOUT)
+    )
+
+
+def clear_run_state(run):
+    caches[settings.RUN_STATE_CACHE].delete(run_state_key(run.id))
+
+
+def update_run_totals(run, positions, track_distance):
+    if not positions:
+        return
+    first = min(position.date_time for position in positions)
+    last = max(position.date_time for position in positions)
+    Run.objects.filter(pk=run.pk).update(
+        positions_count=F('positions_count') + len(positions),
+        positions_revision=F('positions_revision') + 1,
+        track_distance=F('track_distance') + track_distance,
+        speed_sum=F('speed_sum') + sum(position.speed for position in positions),
+        first_position_at=Least(Coalesce('first_position_at', Value(first)), Value(first)),
+        last_position_at=Greatest(Coalesce('last_position_at', Value(last)), Value(last))
+    )
+
+
+def rebuild_run_track(run):
+    positions = list(run.positions.order_by('date_time', 'id'))
+    metrics = track_metrics(None, [
+        {'latitude': position.latitude, 'longitude': position.longitude, 'date_time': position.date_time}
+        for position in positions
+    ])
+    for position, (speed, distance) in zip(positions, metrics):
+        position.speed, position.distance = speed, distance
+    Position.objects.bulk_update(positions, ['speed', 'distance'], batch_size=1000)
+    run.positions_count = len(positions)
+    run.track_distance = metrics[-1][1] if metrics else 0
+    run.speed_sum = sum(speed for speed, _ in metrics)
+    run.first_position_at = positions[0].date_time if positions else None
+    run.last_position_at = positions[-1].date_time if positions else None
+    run.positions_revision += 1
+    run.save(update_fields=[
+        'positions_count', 'track_distance', 'speed_sum', 'first_position_at', 'last_position_at', 'positions_revision'
+    ])
+    transaction.on_commit(lambda: clear_run_state(run))
+
+
+def finalize_run_totals(run):
+    run.distance = round(run.track_distance, 3)
+    start, stop = run.first_position_at, run.last_position_at
+    run.run_time_seconds = (stop - start).total_seconds() if start and stop else 0
+    run.speed = run.speed_sum / run.positions_count if run.positions_count else 0
+
+
+def fix_order_errors(previous, fixes):
+    last = previous['date_time'] if previous else None
+    errors = []
+    for fix in fixes:
+        if last is not None and fix['date_time'] <= last:
+            errors.append({'date_time': ['Date and time has to be later than the previous fix.']})
+            continue
+        errors.append({})
+        last = fix['date_time']
+    return errors if any(errors) else None
+
+
+def track_metrics(previous, fixes):
+    latitudes = [float(fix['latitude']) for fix in fixes]
+    longitudes = [float(fix['longitude']) for fix in fixes]
+    timestamps = [fix['date_time'].timestamp() for fix in fixes]
+    if previous:
+        latitudes.insert(0, float(previous['latitude']))
+        longitudes.insert(0, float(previous['longitude']))
+        timestamps.insert(0, previous['date_time'].timestamp())
+        start_distance = previous['distance']
+    else:
+        start_distance = 0
+    segments = np.round(geo.segment_distances(latitudes, longitudes), 2)
+    durations = np.diff(np.asarray(timestamps, dtype=float))
+    speeds = np.round(np.divide(segments, durations, out=np.zeros_like(segments), where=durations > 0), 2)
+    distances = start_distance + np.cumsum(segments / 1000)
+    if not previous:
+        speeds = np.concatenate(([0.0], speeds))
+        distances = np.concatenate(([0.0], distances))
+    return list(zip(speeds.tolist(), distances.tolist()))
+
+
+def collected_items_key(athlete_id):
+    return f'athlete_items:{athlete_id}'
+
+
+def get_collected_items(athlete):
+    item_ids = cache.get(collected_items_key(athlete.id))
+    if item_ids is None:
+        item_ids = set(athlete.items.values_list('id', flat=True))
+        cache.set(collected_items_key(athlete.id), item_ids, settings.COLLECTED_ITEMS_TIMEOUT)
+    return item_ids
+
+
+def clear_collected_items(*athlete_ids):
+    cache.delete_many([collected_items_key(athlete_id) for athlete_id in athlete_ids])
+
+
+def collect_items(athlete, fixes):
+    item_ids = set()
+    for fix in fixes:
+        item_ids.update(collectible_item_index.nearby(fix['latitude'], fix['longitude']))
+    if not item_ids:
+        return
+    collected = get_collected_items(athlete)
+    new_item_ids = item_ids - collected
+    if new_item_ids:
+        new_item_ids = set(CollectibleItem.objects.filter(id__in=new_item_ids).values_list('id', flat=True))
+    if not new_item_ids:
+        return
+    through = CollectibleItem.athletes.through
+    through.objects.bulk_create(
+        [through(collectibleitem_id=item_id, user_id=athlete.id) for item_id in new_item_ids],
+        ignore_conflicts=True
+    )
+    versions.bump(versions.COLLECTIBLE_ITEMS, versions.user_resource(athlete.id))
+    transaction.on_commit(
+        lambda: cache.set(collected_items_key(athlete.id), collected | new_item_ids, settings.COLLECTED_ITEMS_TIMEOUT)
+    )
+
+
+@transaction.atomic
+def record_positions(run, fixes):
+    run = lock_run(run.pk)
+    previous = get_run_state(run)
+    errors = fix_order_errors(previous, fixes)
+    if errors:
+        raise FixOrderError(errors)
+    return store_positions(run, previous, fixes)
+
+
+def store_positions(run, previous, fixes):
+    positions = [
+        Position(run=run, speed=speed, distance=distance, **fix)
+        for fix, (speed, distance) in zip(fixes, track_metrics(previous, fixes))
+    ]
+    collect_items(run.athlete, fixes)
+    positions = Position.objects.bulk_create(positions)
+    start_distance = previous['distance'] if previous else 0
+    update_run_totals(run, positions, positions[-1].distance - start_distance if positions else 0)
+    if positions:
+        save_run_state(run, max(positions, key=lambda position: position.date_time), previous)
+    return positions
+
+
+@transaction.atomic
+def flush_pending_positions(run_id, limit=None):
+    run = lock_run(run_id)
+    pending = list(run.pending_positions.order_by('date_time', 'id')[:limit])
+    if pending:
+        previous = get_run_state(run)
+        fixes = [{'latitude': fix.latitude, 'longitude': fix.longitude, 'date_time': fix.date_time} for fix in pending]
+        errors = fix_order_errors(previous, fixes) or [{}] * len(fixes)
+        dropped = [fix for fix, error in zip(pending, errors) if error]
+        fixes = [fix for fix, error in zip(fixes, errors) if not error]
+        if fixes:
+            store_positions(run, previous, fixes)
+        PendingPosition.objects.filter(id__in=[fix.id for fix in pending]).delete()
+        return pending, dropped
+    return pending, []
@@ -0,0 +1,176 @@
+import bisect
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+
+from app_run.models import AthleteStats, Subscribe
+
+METRICS = {
+    'distance': 'total_distance',
+    'runs': 'runs_finished',
+    'speed': 'avg_speed'
+}
+BOARD_PREFIX = 'leaderboard:'
+
+
+class LocalBackend:
+    def __init__(self, timeout=None):
+        self.timeout = settings.LEADERBOARD_LOCAL_TIMEOUT if timeout is None else timeout
+        self.boards = {}
+        self.lock = threading.Lock()
+
+    def get(self, board):
+        entry = self.boards.get(board)
+        if entry and time.monotonic() - entry['loaded_at'] < self.timeout:
+            return entry
+
+    def exists(self, board):
+        return self.get(board) is not None
+
+    def replace(self, board, scores):
+        entries = sorted((-score, member) for member, score in scores.items())
+        with self.lock:
+            self.boards[board] = {'entries': entries, 'scores': dict(scores), 'loaded_at': time.monotonic()}
+
+    def update(self, board, member, score):
+        with self.lock:
+            entry = self.get(board)
+            if entry is None:
+                return
+            previous = entry['scores'].get(member)
+            if previous is not None:
+                del entry['entries'][bisect.bisect_left(entry['entries'], (-previous, member))]
+            entry['scores'][member] = score
+            bisect.insort(entry['entries'], (-score, member))
+
+    def delete(self, *boards):
+        with self.lock:
+            for board in boards:
+                self.boards.pop(board, None)
+
+    def clear(self):
+        with self.lock:
+            self.boards.clear()
+
+    def top(self, board, count):
+        return [(member, -score) for score, member in self.boards[board]['entries'][:count]]
+
+    def rank(self, board, member):
+        entry = self.boards[board]
+        score = entry['scores'].get(member)
+        if score is None:
+            return None
+        return bisect.bisect_left(entry['entries'], (-score, member)) + 1, score
+
+    def size(self, board):
+        return len(self.boards[board]['entries'])
+
+
+class RedisBackend:
+    def __init__(self, url=None):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured('The redis leaderboard backend requires the redis package.')
+        self.client = redis.Redis.from_url(url or settings.LEADERBOARD_REDIS_URL)
+
+    def exists(self, board):
+        return bool(self.client.exists(board))
+
+    def replace(self, board, scores):
+        pipeline = self.client.pipeline()
+        pipeline.delete(board)
+        if scores:
+            pipeline.zadd(board, scores)
+        pipeline.execute()
+
+    def update(self, board, member, score):
+        if self.exists(board):
+            self.client.zadd(board, {member: score})
+
+    def delete(self, *boards):
+        if boards:
+            self.client.delete(*boards)
+
+    def clear(self):
+        boards = list(self.client.scan_iter(f'{BOARD_PREFIX}*'))
+        if boards:
+            self.client.delete(*boards)
+
+    def top(self, board, count):
+        return [(int(member), score) for member, score in self.client.zrevrange(board, 0, count - 1, withscores=True)]
+
+    def rank(self, board, member):
+        pipeline = self.client.pipeline()
+        pipeline.zrevrank(board, member)
+        pipeline.zscore(board, member)
+        rank, score = pipeline.execute()
+        if rank is None:
+            return None
+        return rank + 1, score
+
+    def size(self, board):
+        return self.client.zcard(board)
+
+
+BACKENDS = {
+    'local': LocalBackend,
+    'redis': RedisBackend,
+}
+
+
+@lru_cache
+def get_backend(name=None):
+    return BACKENDS[name or settings.LEADERBOARD_BACKEND]()
+
+
+def board_name(metric, coach_id=None):
+    return f'{BOARD_PREFIX}coach:{coach_id}:{metric}' if coach_id else f'{BOARD_PREFIX}global:{metric}'
+
+
+def load_board(metric, coach_id=None):
+    backend = get_backend()
+    board = board_name(metric, coach_id)
+    if not backend.exists(board):
+        stats = AthleteStats.objects.filter(runs_finished__gt=0, **{f'{METRICS[metric]}__isnull': False})
+        if coach_id:
+            stats = stats.filter(athlete_id__in=Subscribe.objects.filter(coach_id=coach_id).values('athlete_id'))
+        backend.replace(board, dict(stats.values_list('athlete_id', METRICS[metric]).iterator(chunk_size=10000)))
+    return backend, board
+
+
+def get_top(metric, count, coach_id=None):
+    backend, board = load_board(metric, coach_id)
+    return backend.top(board, count), backend.size(board)
+
+
+def get_rank(metric, athlete_id, coach_id=None):
+    backend, board = load_board(metric, coach_id)
+    return backend.rank(board, athlete_id), backend.size(board)
+
+
+def update_leaderboards(stats):
+    coach_ids = list(Subscribe.objects.filter(athlete_id=stats.athlete_id).values_list('coach_id', flat=True))
+
+    def update():
+        backend = get_backend()
+        for metric, field in METRICS.items():
+            score = getattr(stats, field)
+            if score is None:
+                continue
+            for coach_id in [None, *coach_ids]:
+                backend.update(board_name(metric, coach_id), stats.athlete_id, score)
+
+    transaction.on_commit(update)
+
+
+def clear_coach_leaderboards(coach_id):
+    transaction.on_commit(lambda: get_backend().delete(*[board_name(metric, coach_id) for metric in METRICS]))
+
+
+def clear_leaderboards():
+    transaction.on_commit(lambda: get_backend().clear())
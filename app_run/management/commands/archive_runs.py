@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from app_run.archive import TRACK_FIELDS, pack_track
+from app_run.models import Run, RunTrack
+
+
+class Command(BaseCommand):
+    help = 'Move positions of finished runs older than N days into packed run tracks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Archive runs created more than this many days ago.')
+        parser.add_argument('--limit', type=int, help='Maximum number of runs to archive.')
+
+    def handle(self, *args, **options):
+        runs = Run.objects.filter(
+            status='finished', created_at__lt=timezone.now() - timedelta(days=options['days']), track__isnull=True
+        ).order_by('id').values_list('id', flat=True)
+        if options['limit']:
+            runs = runs[:options['limit']]
+        archived = points = 0
+        for run_id in list(runs):
+            points += self.archive(run_id)
+            archived += 1
+        self.stdout.write(self.style.SUCCESS(f'Archived {archived} runs with {points} positions.'))
+
+    @transaction.atomic
+    def archive(self, run_id):
+        run = Run.objects.select_for_update().get(pk=run_id)
+        rows = list(run.positions.order_by('date_time', 'id').values_list(*TRACK_FIELDS))
+        RunTrack.objects.create(run=run, data=pack_track(rows), points=len(rows))
+        run.positions.all().delete()
+        return len(rows)
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from app_run.challenges import (RUN_FIELDS, clear_challenges_summary,
+                                get_metrics, rules)
+from app_run.leaderboards import clear_leaderboards
+from app_run.models import Challenge, Run
+from app_run.stats import rebuild_athlete_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild athlete counters from finished runs and award challenges to all athletes in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of athletes processed per batch.')
+
+    def handle(self, *args, **options):
+        athletes = Run.objects.filter(status='finished').order_by('athlete_id').values_list('athlete_id', flat=True)
+        last_id, processed, awarded = 0, 0, 0
+        while True:
+            batch = list(athletes.filter(athlete_id__gt=last_id).distinct()[:options['batch_size']])
+            if not batch:
+                break
+            awarded += self.award(batch)
+            processed += len(batch)
+            last_id = batch[-1]
+            self.stdout.write(f'Processed {processed} athletes.')
+        clear_leaderboards()
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} athletes, awarded {awarded} challenges.'))
+
+    def award(self, athlete_ids):
+        stats = {athlete_stats.athlete_id: athlete_stats for athlete_stats in rebuild_athlete_stats(athlete_ids)}
+        challenges = []
+        for rule in rules:
+            run_filter = rule.run_filter()
+            if run_filter:
+                candidates = Run.objects.filter(
+                    status='finished', athlete_id__in=athlete_ids, **run_filter
+                ).order_by().values_list('athlete_id', flat=True).distinct()
+            else:
+                candidates = athlete_ids
+            challenges += [
+                Challenge(athlete_id=athlete_id, full_name=rule.full_name) for athlete_id in candidates
+                if rule.matches(get_metrics(stats[athlete_id]), ignore=RUN_FIELDS)
+            ]
+        existing = Challenge.objects.filter(athlete_id__in=athlete_ids).count()
+        Challenge.objects.bulk_create(challenges, ignore_conflicts=True)
+        clear_challenges_summary()
+        return Challenge.objects.filter(athlete_id__in=athlete_ids).count() - existing
@@ -0,0 +1,45 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+
+from app_run.models import Run
+from app_run.rollups import rebuild_daily_rollups
+
+
+def rebuild_chunk(athlete_ids):
+    return len(athlete_ids), len(rebuild_daily_rollups(athlete_ids))
+
+
+class Command(BaseCommand):
+    help = 'Rebuild daily athlete rollups from finished runs in parallel chunks of athletes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of athletes processed per chunk.')
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(),
+                            help='Number of worker processes; SQLite always uses one.')
+
+    def handle(self, *args, **options):
+        athlete_ids = list(
+            Run.objects.filter(status='finished').order_by('athlete_id').values_list('athlete_id', flat=True).distinct()
+        )
+        chunks = [athlete_ids[index:index + options['batch_size']]
+                  for index in range(0, len(athlete_ids), options['batch_size'])]
+        workers = options['workers']
+        if connection.vendor == 'sqlite' and workers > 1:
+            self.stdout.write(self.style.WARNING('SQLite allows a single writer, rebuilding with one worker.'))
+            workers = 1
+
+        athletes, rollups = 0, 0
+        if workers > 1:
+            connections.close_all()
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork')) as executor:
+                for chunk_athletes, chunk_rollups in executor.map(rebuild_chunk, chunks):
+                    athletes, rollups = athletes + chunk_athletes, rollups + chunk_rollups
+                    self.stdout.write(f'Processed {athletes} athletes.')
+        else:
+            for chunk_athletes, chunk_rollups in map(rebuild_chunk, chunks):
+                athletes, rollups = athletes + chunk_athletes, rollups + chunk_rollups
+                self.stdout.write(f'Processed {athletes} athletes.')
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rollups} daily rollups of {athletes} athletes.'))
@@ -0,0 +1,63 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from app_run import geo
+from app_run.spatial import PICKUP_RADIUS
+
+
+class Command(BaseCommand):
+    help = 'Benchmark geodesy engines and report their accuracy against geopy geodesic.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--points', type=int, default=10000, help='Number of points in the synthetic track.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        count = options['points']
+        tracks = {
+            'gps fixes (<= 50 m)': self.track(rng, count, 50),
+            'pickup range (<= 200 m)': self.track(rng, count, 200),
+            'long (<= 50 km)': self.track(rng, count, 50000),
+        }
+        reference = {name: geo.get_engine('geodesic').segments(*track) for name, track in tracks.items()}
+
+        for engine_name, engine in geo.ENGINES.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(engine_name))
+            latitudes, longitudes = tracks['gps fixes (<= 50 m)']
+            points = list(zip(latitudes.tolist(), longitudes.tolist()))
+            started = time.perf_counter()
+            for point_a, point_b in zip(points, points[1:]):
+                engine.distance(point_a, point_b)
+            scalar = (time.perf_counter() - started) / (count - 1)
+            started = time.perf_counter()
+            engine.segments(latitudes, longitudes)
+            array = (time.perf_counter() - started) / (count - 1)
+            self.stdout.write(f'  scalar: {scalar * 1e6:10.3f} us/call   array: {array * 1e6:10.3f} us/segment')
+
+            for track_name, (latitudes, longitudes) in tracks.items():
+                expected = reference[track_name]
+                errors = np.abs(engine.segments(latitudes, longitudes) - expected)
+                relative = errors / np.maximum(expected, 1e-9)
+                self.stdout.write(
+                    f'  {track_name:24} max error {errors.max():9.4f} m   mean error {errors.mean():9.4f} m   '
+                    f'max relative {relative.max() * 100:7.4f} %'
+                )
+
+            latitudes, longitudes = tracks['pickup range (<= 200 m)']
+            actual = engine.segments(latitudes, longitudes)
+            expected = reference['pickup range (<= 200 m)']
+            flipped = int(np.sum((np.round(actual, 3) <= PICKUP_RADIUS) != (np.round(expected, 3) <= PICKUP_RADIUS)))
+            self.stdout.write(f'  pickup decisions different from geodesic: {flipped} of {count - 1}')
+
+    def track(self, rng, count, max_step):
+        steps = rng.uniform(0, max_step, count - 1)
+        bearings = rng.uniform(0, 2 * np.pi, count - 1)
+        latitudes = np.clip(np.concatenate((
+            rng.uniform(-60, 60, 1), np.degrees(steps * np.cos(bearings) / geo.EARTH_RADIUS)
+        )).cumsum(), -80, 80)
+        d_longitudes = np.degrees(steps * np.sin(bearings) / (geo.EARTH_RADIUS * np.cos(np.radians(latitudes[:-1]))))
+        longitudes = (np.concatenate((rng.uniform(-180, 180, 1), d_longitudes)).cumsum() + 180) % 360 - 180
+        return latitudes, longitudes
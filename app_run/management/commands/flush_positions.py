@@ -0,0 +1,56 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from app_run.ingest import flush_pending_positions
+from app_run.models import PendingPosition, PositionFlush
+
+
+class Command(BaseCommand):
+    help = 'Drain the buffered position queue into positions with bulk inserts per run.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.POSITION_FLUSH_BATCH_SIZE,
+                            help='Maximum number of positions flushed per run in one transaction.')
+        parser.add_argument('--interval', type=float, default=1, help='Seconds to sleep when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit.')
+
+    def handle(self, *args, **options):
+        while True:
+            flushed = self.flush(options['batch_size'])
+            if options['once'] and not flushed:
+                break
+            if not flushed:
+                time.sleep(options['interval'])
+
+    def flush(self, batch_size):
+        run_ids = list(PendingPosition.objects.order_by('run_id').values_list('run_id', flat=True).distinct())
+        if not run_ids:
+            return 0
+        started = time.perf_counter()
+        flushed, dropped, max_latency = 0, 0, 0
+        for run_id in run_ids:
+            pending, run_dropped = flush_pending_positions(run_id, batch_size)
+            if pending:
+                flushed += len(pending)
+                dropped += len(run_dropped)
+                oldest = min(fix.received_at for fix in pending)
+                max_latency = max(max_latency, (timezone.now() - oldest).total_seconds())
+        stats = {
+            'flushed_at': timezone.now(),
+            'positions': flushed - dropped,
+            'dropped': dropped,
+            'runs': len(run_ids),
+            'duration_seconds': round(time.perf_counter() - started, 3),
+            'max_latency_seconds': round(max_latency, 3),
+            'depth': PendingPosition.objects.count()
+        }
+        PositionFlush.objects.update_or_create(id=1, defaults=stats)
+        self.stdout.write(
+            f'Flushed {stats["positions"]} positions of {stats["runs"]} runs in {stats["duration_seconds"]} s, '
+            f'dropped {stats["dropped"]} out of order, '
+            f'max latency {stats["max_latency_seconds"]} s, depth {stats["depth"]}.'
+        )
+        return flushed
@@ -0,0 +1,230 @@
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from app_run.management.commands.seed_load import generate_track
+
+
+class Client:
+    def __init__(self, base_url, recorder, timeout):
+        url = urlsplit(base_url)
+        self.host, self.port, self.timeout = url.hostname, url.port or 80, timeout
+        self.recorder = recorder
+        self.connection = None
+
+    def request(self, method, path, label, payload=None):
+        body = json.dumps(payload) if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if body else {}
+        started = time.perf_counter()
+        try:
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            content = response.read()
+            status = response.status
+            if response.getheader('Connection', '').lower() == 'close':
+                self.close()
+        except (OSError, http.client.HTTPException):
+            self.close()
+            content, status = b'', 0
+        self.recorder.add(f'{method} {label}', time.perf_counter() - started, status)
+        if not 200 <= status < 300:
+            return None
+        return json.loads(content) if content else {}
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def add(self, endpoint, seconds, status):
+        with self.lock:
+            self.latencies[endpoint].append(seconds)
+            if not 200 <= status < 300:
+                self.errors[endpoint] += 1
+
+    def report(self, duration):
+        report = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            milliseconds = np.asarray(latencies) * 1000
+            p50, p95, p99 = np.percentile(milliseconds, [50, 95, 99])
+            report[endpoint] = {
+                'requests': len(latencies),
+                'errors': self.errors[endpoint],
+                'throughput': round(len(latencies) / duration, 2),
+                'mean_ms': round(float(milliseconds.mean()), 2),
+                'p50_ms': round(float(p50), 2),
+                'p95_ms': round(float(p95), 2),
+                'p99_ms': round(float(p99), 2),
+                'max_ms': round(float(milliseconds.max()), 2)
+            }
+        return report
+
+
+class Command(BaseCommand):
+    help = ('Simulate concurrent runners (create, start, stream positions, stop) and coaches polling analytics '
+            'against a running server, and report throughput and p50/p95/p99 latency per endpoint.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the server under test.')
+        parser.add_argument('--serve', action='store_true',
+                            help='Start a local runserver process with the current settings on the --url port.')
+        parser.add_argument('--runners', type=int, default=20, help='Number of concurrent runners.')
+        parser.add_argument('--positions', type=int, default=60, help='Number of positions each runner sends.')
+        parser.add_argument('--rate', type=float, default=1, help='Positions per second sent by each runner.')
+        parser.add_argument('--batch', type=int, default=0,
+                            help='Send positions in batches of this size through /positions/batch/.')
+        parser.add_argument('--coaches', type=int, default=5, help='Number of concurrently polling coaches.')
+        parser.add_argument('--poll-interval', type=float, default=1, help='Seconds between coach polls.')
+        parser.add_argument('--timeout', type=float, default=30, help='Request timeout in seconds.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Save the results as JSON to this file.')
+
+    def handle(self, *args, **options):
+        athlete_ids = list(User.objects.filter(is_staff=False, is_superuser=False)
+                           .order_by('id').values_list('id', flat=True)[:options['runners']])
+        coach_ids = list(User.objects.filter(is_staff=True, is_superuser=False)
+                         .order_by('id').values_list('id', flat=True)[:max(options['coaches'], 1)])
+        if len(athlete_ids) < options['runners']:
+            raise CommandError(f'Need {options["runners"]} athletes, found {len(athlete_ids)}; run seed_load first.')
+        if options['coaches'] and not coach_ids:
+            raise CommandError('No coaches found; run seed_load first.')
+
+        server = self.serve(options['url']) if options['serve'] else None
+        recorder = Recorder()
+        finished = threading.Event()
+        started_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(options['runners'] + options['coaches']) as executor:
+                coaches = [
+                    executor.submit(self.coach, options, recorder, coach_ids[index % len(coach_ids)], finished)
+                    for index in range(options['coaches'])
+                ]
+                runners = [
+                    executor.submit(self.runner, options, recorder, athlete_id, index)
+                    for index, athlete_id in enumerate(athlete_ids)
+                ]
+                completed = sum(runner.result() for runner in runners)
+                finished.set()
+                for coach in coaches:
+                    coach.result()
+        finally:
+            finished.set()
+            if server:
+                server.terminate()
+                server.wait()
+        duration = time.perf_counter() - started
+
+        results = {
+            'started_at': started_at.isoformat(),
+            'commit': self.commit(),
+            'options': {key: options[key] for key in ('url', 'runners', 'positions', 'rate', 'batch', 'coaches',
+                                                      'poll_interval', 'seed')},
+            'duration_seconds': round(duration, 3),
+            'runs_completed': completed,
+            'endpoints': recorder.report(duration)
+        }
+        self.write_report(results)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(results, file, indent=2)
+            self.stdout.write(f'Saved results to {options["output"]}.')
+
+    def runner(self, options, recorder, athlete_id, index):
+        client = Client(options['url'], recorder, options['timeout'])
+        rng = np.random.default_rng([options['seed'], index])
+        try:
+            run = client.request('POST', '/api/runs/', '/api/runs/', {'athlete': athlete_id, 'comment': 'Load test'})
+            if run is None or client.request('POST', f'/api/runs/{run["id"]}/start/', '/api/runs/{id}/start/') is None:
+                return 0
+            fixes = generate_track(rng, options['positions'], datetime.now(timezone.utc))
+            size = options['batch'] or 1
+            for offset in range(0, len(fixes), size):
+                moment = time.perf_counter()
+                batch = [
+                    {'latitude': fix['latitude'], 'longitude': fix['longitude'],
+                     'date_time': fix['date_time'].strftime('%Y-%m-%dT%H:%M:%S.%f')}
+                    for fix in fixes[offset:offset + size]
+                ]
+                if options['batch']:
+                    client.request('POST', f'/api/runs/{run["id"]}/positions/batch/',
+                                   '/api/runs/{id}/positions/batch/', batch)
+                else:
+                    client.request('POST', '/api/positions/', '/api/positions/', {'run': run['id'], **batch[0]})
+                time.sleep(max(0, len(batch) / options['rate'] - (time.perf_counter() - moment)))
+            return int(client.request('POST', f'/api/runs/{run["id"]}/stop/', '/api/runs/{id}/stop/') is not None)
+        finally:
+            client.close()
+
+    def coach(self, options, recorder, coach_id, finished):
+        client = Client(options['url'], recorder, options['timeout'])
+        try:
+            while not finished.is_set():
+                moment = time.perf_counter()
+                client.request('GET', f'/api/analytics_for_coach/{coach_id}/', '/api/analytics_for_coach/{id}/')
+                client.request('GET', '/api/users/?type=athlete&size=50', '/api/users/?type=athlete&size=50')
+                finished.wait(max(0, options['poll_interval'] - (time.perf_counter() - moment)))
+        finally:
+            client.close()
+
+    def serve(self, base_url):
+        url = urlsplit(base_url)
+        address = f'{url.hostname}:{url.port or 80}'
+        server = subprocess.Popen(
+            [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'runserver', address, '--noreload', '--skip-checks'],
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE,
+                 'PYTHONPATH': os.pathsep.join(filter(None, sys.path))},
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection((url.hostname, url.port or 80), timeout=1).close()
+                return server
+            except OSError:
+                if server.poll() is not None:
+                    break
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f'Local server did not start on {address}.')
+
+    def commit(self):
+        try:
+            return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def write_report(self, results):
+        self.stdout.write(
+            f'{results["runs_completed"]} runs completed in {results["duration_seconds"]} s.\n'
+            f'{"endpoint":48} {"requests":>8} {"errors":>6} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}'
+        )
+        for endpoint, stats in results['endpoints'].items():
+            self.stdout.write(
+                f'{endpoint:48} {stats["requests"]:8} {stats["errors"]:6} {stats["throughput"]:8} '
+                f'{stats["p50_ms"]:8} {stats["p95_ms"]:8} {stats["p99_ms"]:8}'
+            )
@@ -0,0 +1,34 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app_run.imports import claim_import_job, process_import_job
+
+
+class Command(BaseCommand):
+    help = 'Process uploaded collectible item files in chunks, one import job at a time.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.COLLECTIBLE_ITEM_IMPORT_BATCH_SIZE,
+                            help='Number of rows imported per transaction.')
+        parser.add_argument('--interval', type=float, default=1, help='Seconds to sleep when no job is pending.')
+        parser.add_argument('--once', action='store_true', help='Process pending jobs once and exit.')
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_import_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+                continue
+            job = process_import_job(job, options['batch_size'])
+            if job.status == 'failed':
+                self.stderr.write(f'Import job {job.id} failed: {job.message}')
+                continue
+            self.stdout.write(
+                f'Import job {job.id}: {job.rows_processed} rows, {job.items_created} items created, '
+                f'{job.items_updated} updated, {job.items_unchanged} unchanged, {len(job.errors)} invalid rows '
+                f'in {(job.finished_at - job.started_at).total_seconds():.3f} s.'
+            )
@@ -0,0 +1,26 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from app_run.leaderboards import clear_leaderboards
+from app_run.stats import rebuild_athlete_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild materialized athlete and coach statistics from runs and ratings in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of users processed per batch.')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(is_superuser=False).order_by('id').values_list('id', flat=True)
+        last_id, processed = 0, 0
+        while True:
+            batch = list(users.filter(id__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+            rebuild_athlete_stats(batch)
+            processed += len(batch)
+            last_id = batch[-1]
+            self.stdout.write(f'Rebuilt statistics of {processed} users.')
+        clear_leaderboards()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt statistics of {processed} users.'))
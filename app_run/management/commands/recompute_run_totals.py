@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app_run.archive import iter_track
+from app_run.ingest import clear_run_state, finalize_run_totals, track_metrics
+from app_run.models import Run
+
+
+class Command(BaseCommand):
+    help = 'Recompute running totals of runs from their raw positions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--run', type=int, nargs='*', dest='run_ids', help='IDs of runs to recompute.')
+        parser.add_argument('--status', choices=[status for status, _ in Run.STATUSES],
+                            help='Recompute only runs with this status.')
+        parser.add_argument('--finalize', action='store_true',
+                            help='Also rewrite distance, time and speed of finished runs.')
+
+    def handle(self, *args, **options):
+        runs = Run.objects.order_by('id')
+        if options['run_ids']:
+            runs = runs.filter(id__in=options['run_ids'])
+        if options['status']:
+            runs = runs.filter(status=options['status'])
+        updated = 0
+        for run in runs.iterator():
+            self.recompute(run, options['finalize'])
+            updated += 1
+        self.stdout.write(self.style.SUCCESS(f'Recomputed totals of {updated} runs.'))
+
+    @transaction.atomic
+    def recompute(self, run, finalize):
+        rows = list(iter_track(run.id))
+        _, latitudes, longitudes, timestamps, speeds, _ = zip(*rows) if rows else ((), (), (), (), (), ())
+        metrics = track_metrics(None, [
+            {'latitude': latitude, 'longitude': longitude, 'date_time': date_time}
+            for latitude, longitude, date_time in zip(latitudes, longitudes, timestamps)
+        ])
+        run.positions_count = len(rows)
+        run.track_distance = metrics[-1][1] if metrics else 0
+        run.speed_sum = sum(speeds)
+        run.first_position_at = timestamps[0] if rows else None
+        run.last_position_at = timestamps[-1] if rows else None
+        fields = ['positions_count', 'track_distance', 'speed_sum', 'first_position_at', 'last_position_at']
+        if finalize and run.status == 'finished':
+            finalize_run_totals(run)
+            fields += ['distance', 'run_time_seconds', 'speed']
+        run.save(update_fields=fields)
+        clear_run_state(run)
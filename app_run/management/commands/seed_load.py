@@ -0,0 +1,217 @@
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.db.models import Max
+
+from app_run import versions
+from app_run.geo import EARTH_RADIUS
+from app_run.ingest import finalize_run_totals, track_metrics
+from app_run.models import CoachRating, CollectibleItem, Position, Run, Subscribe
+from app_run.spatial import RESOURCE_NAME, collectible_item_index
+from app_run.stats import update_rating_stats
+
+CITIES = [
+    (55.7558, 37.6173),
+    (59.9386, 30.3141),
+    (56.8389, 60.6057),
+    (55.0084, 82.9357),
+    (43.5855, 39.7231),
+]
+SAMPLE_INTERVAL = 5
+MAX_POSITIONS = 32767 // SAMPLE_INTERVAL
+
+
+@contextmanager
+def historic_created_at():
+    field = Run._meta.get_field('created_at')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def generate_track(rng, count, started):
+    latitude, longitude = CITIES[rng.integers(len(CITIES))]
+    latitude += rng.normal(0, 0.05)
+    longitude += rng.normal(0, 0.05)
+    headings = rng.uniform(0, 2 * math.pi) + np.cumsum(rng.normal(0, 0.15, count))
+    steps = np.clip(rng.normal(rng.uniform(2.2, 4), 0.3, count), 0.5, 7) * SAMPLE_INTERVAL
+    steps[0] = 0
+    north = np.cumsum(steps * np.cos(headings))
+    east = np.cumsum(steps * np.sin(headings))
+    latitudes = np.round(latitude + np.degrees(north / EARTH_RADIUS), 4)
+    longitudes = np.round(longitude + np.degrees(east / (EARTH_RADIUS * math.cos(math.radians(latitude)))), 4)
+    return [
+        {'latitude': float(fix_latitude), 'longitude': float(fix_longitude),
+         'date_time': started + timedelta(seconds=index * SAMPLE_INTERVAL)}
+        for index, (fix_latitude, fix_longitude) in enumerate(zip(latitudes, longitudes))
+    ]
+
+
+def seed_runs(task):
+    seed, chunk, athlete_ids, options = task
+    rng = np.random.default_rng([seed, chunk])
+    start = options['start']
+    runs, tracks = [], []
+    for athlete_id in athlete_ids:
+        for _ in range(rng.poisson(options['runs'])):
+            created_at = start + timedelta(seconds=int(rng.integers(options['days'] * 24 * 60 * 60)))
+            status = str(rng.choice(['finished', 'in_progress', 'init'], p=[0.9, 0.05, 0.05]))
+            run = Run(athlete_id=athlete_id, comment=f'Load run {len(runs)}', status=status, created_at=created_at)
+            fixes = []
+            if status != 'init':
+                count = int(np.clip(rng.poisson(options['positions']), 2, MAX_POSITIONS))
+                fixes = generate_track(rng, count, created_at)
+                metrics = track_metrics(None, fixes)
+                run.positions_count = count
+                run.track_distance = metrics[-1][1]
+                run.speed_sum = sum(speed for speed, _ in metrics)
+                run.first_position_at = fixes[0]['date_time']
+                run.last_position_at = fixes[-1]['date_time']
+                if status == 'finished':
+                    finalize_run_totals(run)
+                fixes = [{**fix, 'speed': speed, 'distance': distance} for fix, (speed, distance) in zip(fixes, metrics)]
+            runs.append(run)
+            tracks.append(fixes)
+
+    positions, created = [], 0
+    with transaction.atomic(), historic_created_at():
+        Run.objects.bulk_create(runs, batch_size=options['batch_size'])
+        for run, fixes in zip(runs, tracks):
+            positions += [Position(run_id=run.id, **fix) for fix in fixes]
+            if len(positions) >= options['batch_size']:
+                created += len(Position.objects.bulk_create(positions, batch_size=options['batch_size']))
+                positions = []
+        created += len(Position.objects.bulk_create(positions, batch_size=options['batch_size']))
+    return len(runs), created
+
+
+class Command(BaseCommand):
+    help = ('Generate deterministic synthetic users, runs, GPS tracks and collectible items for load and benchmark '
+            'work. Target a database with --settings=project_run.settings.local or project_run.settings.production.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed generates the same data.')
+        parser.add_argument('--prefix', default='load', help='Username prefix of generated users.')
+        parser.add_argument('--athletes', type=int, default=1000, help='Number of athletes.')
+        parser.add_argument('--coaches', type=int, default=50, help='Number of coaches.')
+        parser.add_argument('--runs', type=float, default=10, help='Mean number of runs per athlete.')
+        parser.add_argument('--positions', type=float, default=300, help='Mean number of positions per run.')
+        parser.add_argument('--items', type=int, default=10000, help='Number of collectible items around the tracks.')
+        parser.add_argument('--start', type=datetime.fromisoformat, default=datetime(2024, 1, 1),
+                            help='Date of the earliest run, YYYY-MM-DD.')
+        parser.add_argument('--days', type=int, default=365, help='Number of days the runs are spread over.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Number of rows per bulk insert.')
+        parser.add_argument('--chunk-size', type=int, default=200, help='Number of athletes per worker task.')
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(),
+                            help='Number of worker processes; SQLite always uses one.')
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=f'{options["prefix"]}_').exists():
+            raise CommandError(f'Users with prefix "{options["prefix"]}" already exist, choose another --prefix.')
+        workers = options['workers']
+        if connection.vendor == 'sqlite' and workers > 1:
+            self.stdout.write(self.style.WARNING('SQLite allows a single writer, seeding with one worker.'))
+            workers = 1
+        options['start'] = options['start'].replace(tzinfo=options['start'].tzinfo or timezone.utc)
+        rng = np.random.default_rng(options['seed'])
+
+        coach_ids, athlete_ids = self.create_users(options)
+        self.stdout.write(f'Created {len(coach_ids)} coaches and {len(athlete_ids)} athletes.')
+        self.create_relations(rng, coach_ids, athlete_ids, options['batch_size'])
+        item_ids = self.create_items(rng, options['items'], options['batch_size'])
+        self.stdout.write(f'Created {len(item_ids)} collectible items.')
+        self.create_pickups(rng, athlete_ids, item_ids, options['batch_size'])
+
+        settings = {key: options[key] for key in ('runs', 'positions', 'start', 'days', 'batch_size')}
+        tasks = [
+            (options['seed'], chunk, athlete_ids[index:index + options['chunk_size']], settings)
+            for chunk, index in enumerate(range(0, len(athlete_ids), options['chunk_size']))
+        ]
+        runs, positions = 0, 0
+        if workers > 1:
+            connections.close_all()
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork')) as executor:
+                for task_runs, task_positions in executor.map(seed_runs, tasks):
+                    runs, positions = runs + task_runs, positions + task_positions
+                    self.stdout.write(f'Created {runs} runs and {positions} positions.')
+        else:
+            for task_runs, task_positions in map(seed_runs, tasks):
+                runs, positions = runs + task_runs, positions + task_positions
+                self.stdout.write(f'Created {runs} runs and {positions} positions.')
+
+        call_command('backfill_challenges', batch_size=options['batch_size'], stdout=self.stdout)
+        call_command('backfill_rollups', workers=workers, stdout=self.stdout)
+        update_rating_stats(coach_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(coach_ids) + len(athlete_ids)} users, {runs} runs, {positions} positions '
+            f'and {len(item_ids)} collectible items.'
+        ))
+
+    def create_users(self, options):
+        users = [
+            User(username=f'{options["prefix"]}_coach_{index}', first_name='Coach', last_name=str(index),
+                 password=UNUSABLE_PASSWORD_PREFIX, is_staff=True)
+            for index in range(options['coaches'])
+        ] + [
+            User(username=f'{options["prefix"]}_athlete_{index}', first_name='Athlete', last_name=str(index),
+                 password=UNUSABLE_PASSWORD_PREFIX)
+            for index in range(options['athletes'])
+        ]
+        User.objects.bulk_create(users, batch_size=options['batch_size'])
+        ids = list(
+            User.objects.filter(username__startswith=f'{options["prefix"]}_')
+            .order_by('id').values_list('id', 'is_staff')
+        )
+        return [user_id for user_id, is_staff in ids if is_staff], [user_id for user_id, is_staff in ids if not is_staff]
+
+    def create_relations(self, rng, coach_ids, athlete_ids, batch_size):
+        if not coach_ids:
+            return
+        subscribes, ratings = [], []
+        for athlete_id in athlete_ids:
+            if rng.random() < 0.8:
+                coach_id = coach_ids[rng.integers(len(coach_ids))]
+                subscribes.append(Subscribe(athlete_id=athlete_id, coach_id=coach_id))
+                if rng.random() < 0.5:
+                    ratings.append(CoachRating(athlete_id=athlete_id, coach_id=coach_id, rating=int(rng.integers(1, 6))))
+        Subscribe.objects.bulk_create(subscribes, batch_size=batch_size)
+        CoachRating.objects.bulk_create(ratings, batch_size=batch_size)
+
+    def create_items(self, rng, count, batch_size):
+        centers = np.array(CITIES)[rng.integers(len(CITIES), size=count)]
+        latitudes = np.round(centers[:, 0] + rng.normal(0, 0.08, count), 6)
+        longitudes = np.round(centers[:, 1] + rng.normal(0, 0.08, count), 6)
+        values = rng.integers(1, 100, size=count)
+        last_uid = CollectibleItem.objects.filter(uid__regex=r'^\d{10}$').aggregate(last=Max('uid'))['last']
+        offset = int(last_uid) + 1 if last_uid else 0
+        items = CollectibleItem.objects.bulk_create([
+            CollectibleItem(name=f'Load item {index}', uid=f'{offset + index:010d}', latitude=float(latitude),
+                            longitude=float(longitude), picture=f'https://example.com/items/{index % 50}.png',
+                            value=int(value))
+            for index, (latitude, longitude, value) in enumerate(zip(latitudes, longitudes, values))
+        ], batch_size=batch_size)
+        versions.bump(RESOURCE_NAME, versions.COLLECTIBLE_ITEMS)
+        collectible_item_index.invalidate()
+        return [item.id for item in items]
+
+    def create_pickups(self, rng, athlete_ids, item_ids, batch_size):
+        if not item_ids:
+            return
+        through = CollectibleItem.athletes.through
+        pickups = [
+            through(user_id=athlete_id, collectibleitem_id=item_ids[index])
+            for athlete_id in athlete_ids
+            for index in set(rng.integers(len(item_ids), size=rng.poisson(3)).tolist())
+        ]
+        through.objects.bulk_create(pickups, batch_size=batch_size, ignore_conflicts=True)
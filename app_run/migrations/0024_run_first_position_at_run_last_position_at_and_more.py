@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-18 18:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_run', '0023_resourceversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='run',
+            name='first_position_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Время первой позиции'),
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='last_position_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Время последней позиции'),
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='positions_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Количество позиций'),
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='speed_sum',
+            field=models.FloatField(default=0, verbose_name='Сумма скоростей'),
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='track_distance',
+            field=models.FloatField(default=0, verbose_name='Пройденное расстояние'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 18:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_run', '0024_run_first_position_at_run_last_position_at_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingPosition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('latitude', models.DecimalField(decimal_places=4, max_digits=6, verbose_name='Широта')),
+                ('longitude', models.DecimalField(decimal_places=4, max_digits=7, verbose_name='Долгота')),
+                ('date_time', models.DateTimeField(verbose_name='Дата и время')),
+                ('received_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата и время получения')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_positions', to='app_run.run', verbose_name='Забег')),
+            ],
+            options={
+                'verbose_name': 'Позиция в очереди',
+                'verbose_name_plural': 'Позиции в очереди',
+            },
+        ),
+    ]
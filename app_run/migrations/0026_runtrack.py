@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 18:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_run', '0025_pendingposition'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RunTrack',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.BinaryField(verbose_name='Упакованный трек')),
+                ('points', models.PositiveIntegerField(default=0, verbose_name='Количество позиций')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата и время архивации')),
+                ('run', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='track', to='app_run.run', verbose_name='Забег')),
+            ],
+            options={
+                'verbose_name': 'Архивный трек',
+                'verbose_name_plural': 'Архивные треки',
+            },
+        ),
+    ]
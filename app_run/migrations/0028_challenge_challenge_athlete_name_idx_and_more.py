@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-18 18:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_run', '0027_position_position_run_date_time_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='challenge',
+            index=models.Index(fields=['athlete', 'full_name'], name='challenge_athlete_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coachrating',
+            index=models.Index(fields=['coach', 'rating'], name='coachrating_coach_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pendingposition',
+            index=models.Index(fields=['run', 'date_time', 'id'], name='pending_run_date_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='run',
+            index=models.Index(fields=['athlete', 'status'], name='run_athlete_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='run',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='run_status_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscribe',
+            index=models.Index(fields=['coach', 'athlete'], name='subscribe_coach_athlete_idx'),
+        ),
+    ]
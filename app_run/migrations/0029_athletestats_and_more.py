@@ -0,0 +1,54 @@
+# Generated by Django 5.2 on 2026-10-18 18:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def delete_duplicate_challenges(apps, schema_editor):
+    Challenge = apps.get_model('app_run', 'Challenge')
+    duplicates = Challenge.objects.values('athlete', 'full_name').annotate(
+        first_id=Min('id'), count=Count('id')
+    ).filter(count__gt=1)
+    for duplicate in duplicates:
+        Challenge.objects.filter(
+            athlete=duplicate['athlete'], full_name=duplicate['full_name']
+        ).exclude(id=duplicate['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_run', '0028_challenge_challenge_athlete_name_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AthleteStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('runs_finished', models.PositiveIntegerField(default=0, verbose_name='Завершённые забеги')),
+                ('total_distance', models.FloatField(default=0, verbose_name='Общее расстояние')),
+            ],
+            options={
+                'verbose_name': 'Статистика атлета',
+                'verbose_name_plural': 'Статистика атлетов',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='challenge',
+            name='challenge_athlete_name_idx',
+        ),
+        migrations.RunPython(delete_duplicate_challenges, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='challenge',
+            constraint=models.UniqueConstraint(fields=('athlete', 'full_name'), name='unique_athlete_challenge'),
+        ),
+        migrations.AddField(
+            model_name='athletestats',
+            name='athlete',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to=settings.AUTH_USER_MODEL, verbose_name='Атлет'),
+        ),
+    ]
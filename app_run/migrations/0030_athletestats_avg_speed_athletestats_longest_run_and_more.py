@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-18 18:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_run', '0029_athletestats_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='athletestats',
+            name='avg_speed',
+            field=models.FloatField(blank=True, null=True, verbose_name='Средняя скорость'),
+        ),
+        migrations.AddField(
+            model_name='athletestats',
+            name='longest_run',
+            field=models.FloatField(blank=True, null=True, verbose_name='Самый длинный забег'),
+        ),
+        migrations.AddField(
+            model_name='athletestats',
+            name='rating_avg',
+            field=models.FloatField(blank=True, null=True, verbose_name='Средний рейтинг'),
+        ),
+        migrations.AddField(
+            model_name='athletestats',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Количество оценок'),
+        ),
+    ]
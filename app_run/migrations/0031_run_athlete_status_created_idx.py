@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 19:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_run', '0030_athletestats_avg_speed_athletestats_longest_run_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='run',
+            name='run_athlete_status_idx',
+        ),
+        migrations.AddIndex(
+            model_name='run',
+            index=models.Index(fields=['athlete', 'status', 'created_at'], name='run_athlete_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-18 19:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_run', '0031_run_athlete_status_created_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AthleteDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('runs', models.PositiveIntegerField(default=0, verbose_name='Завершённые забеги')),
+                ('distance', models.FloatField(default=0, verbose_name='Расстояние')),
+                ('run_time_seconds', models.PositiveIntegerField(default=0, verbose_name='Время забегов')),
+                ('speed_sum', models.FloatField(default=0, verbose_name='Сумма средних скоростей')),
+                ('athlete', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to=settings.AUTH_USER_MODEL, verbose_name='Атлет')),
+            ],
+            options={
+                'verbose_name': 'Дневная сводка атлета',
+                'verbose_name_plural': 'Дневные сводки атлетов',
+                'constraints': [models.UniqueConstraint(fields=('athlete', 'day'), name='unique_athlete_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-18 19:16
+
+import django.core.files.storage
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_run', '0032_athletedailyrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(blank=True, storage=django.core.files.storage.FileSystemStorage(), upload_to='imports/%Y/%m/%d/', verbose_name='Файл')),
+                ('file_name', models.CharField(max_length=255, verbose_name='Имя файла')),
+                ('status', models.CharField(choices=[('pending', 'PENDING'), ('processing', 'PROCESSING'), ('finished', 'FINISHED'), ('failed', 'FAILED')], default='pending', max_length=12, verbose_name='Статус')),
+                ('rows_processed', models.PositiveIntegerField(default=0, verbose_name='Обработано строк')),
+                ('items_created', models.PositiveIntegerField(default=0, verbose_name='Создано предметов')),
+                ('errors', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Ошибочные строки')),
+                ('message', models.TextField(blank=True, verbose_name='Сообщение об ошибке')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата и время загрузки')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата и время начала обработки')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата и время окончания обработки')),
+            ],
+            options={
+                'verbose_name': 'Загрузка предметов',
+                'verbose_name_plural': 'Загрузки предметов',
+                'indexes': [models.Index(fields=['status', 'created_at'], name='importjob_status_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2 on 2026-10-18 19:18
+
+from django.db import migrations, models
+from django.db.models import Count
+
+ITEM_FIELDS = ('name', 'latitude', 'longitude', 'picture', 'value')
+
+
+def merge_duplicate_items(apps, schema_editor):
+    CollectibleItem = apps.get_model('app_run', 'CollectibleItem')
+    Collected = CollectibleItem.athletes.through
+    duplicates = CollectibleItem.objects.values('uid').annotate(count=Count('id')).filter(count__gt=1)
+    for duplicate in duplicates:
+        first, *others = CollectibleItem.objects.filter(uid=duplicate['uid']).order_by('id')
+        for field in ITEM_FIELDS:
+            setattr(first, field, getattr(others[-1], field))
+        first.save(update_fields=ITEM_FIELDS)
+        other_ids = [item.id for item in others]
+        collected = set(Collected.objects.filter(collectibleitem=first).values_list('user_id', flat=True))
+        athlete_ids = set(
+            Collected.objects.filter(collectibleitem_id__in=other_ids).values_list('user_id', flat=True)
+        ) - collected
+        Collected.objects.bulk_create([
+            Collected(collectibleitem_id=first.id, user_id=athlete_id) for athlete_id in athlete_ids
+        ])
+        CollectibleItem.objects.filter(id__in=other_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_run', '0033_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='items_unchanged',
+            field=models.PositiveIntegerField(default=0, verbose_name='Неизменённых предметов'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='items_updated',
+            field=models.PositiveIntegerField(default=0, verbose_name='Обновлено предметов'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='mode',
+            field=models.CharField(choices=[('insert', 'INSERT'), ('upsert', 'UPSERT')], default='insert', max_length=6, verbose_name='Режим загрузки'),
+        ),
+        migrations.RunPython(merge_duplicate_items, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='collectibleitem',
+            name='uid',
+            field=models.CharField(max_length=10, unique=True, verbose_name='Идентификатор'),
+        ),
+    ]
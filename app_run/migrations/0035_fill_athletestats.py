@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-18 20:05
+
+from django.db import migrations
+from django.db.models import Avg, Count, Max, Sum
+
+STATS_FIELDS = ('runs_finished', 'total_distance', 'longest_run', 'avg_speed', 'rating_avg', 'rating_count')
+
+
+def fill_athlete_stats(apps, schema_editor):
+    AthleteStats = apps.get_model('app_run', 'AthleteStats')
+    CoachRating = apps.get_model('app_run', 'CoachRating')
+    Run = apps.get_model('app_run', 'Run')
+    runs = {
+        row['athlete']: row for row in Run.objects.filter(status='finished').values('athlete').annotate(
+            runs_finished=Count('id'), total_distance=Sum('distance'),
+            longest_run=Max('distance'), avg_speed=Avg('speed')
+        ).order_by()
+    }
+    ratings = {
+        row['coach']: row for row in CoachRating.objects.values('coach').annotate(
+            rating_avg=Avg('rating'), rating_count=Count('rating')
+        ).order_by()
+    }
+    stats = []
+    for athlete_id in sorted(runs.keys() | ratings.keys()):
+        values = {**runs.get(athlete_id, {}), **ratings.get(athlete_id, {})}
+        stats.append(AthleteStats(
+            athlete_id=athlete_id,
+            runs_finished=values.get('runs_finished') or 0,
+            total_distance=values.get('total_distance') or 0,
+            longest_run=values.get('longest_run'),
+            avg_speed=values.get('avg_speed'),
+            rating_avg=values.get('rating_avg'),
+            rating_count=values.get('rating_count') or 0
+        ))
+    AthleteStats.objects.bulk_create(
+        stats, batch_size=1000, update_conflicts=True, unique_fields=['athlete'], update_fields=STATS_FIELDS
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_run', '0034_collectibleitem_unique_uid'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_athlete_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-18 19:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_run', '0036_challenge_name_athlete_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PositionFlush',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('flushed_at', models.DateTimeField(verbose_name='Дата и время сброса')),
+                ('positions', models.PositiveIntegerField(default=0, verbose_name='Сохранено позиций')),
+                ('dropped', models.PositiveIntegerField(default=0, verbose_name='Отброшено позиций')),
+                ('runs', models.PositiveIntegerField(default=0, verbose_name='Количество забегов')),
+                ('duration_seconds', models.FloatField(default=0, verbose_name='Длительность, с')),
+                ('max_latency_seconds', models.FloatField(default=0, verbose_name='Максимальная задержка, с')),
+                ('depth', models.PositiveIntegerField(default=0, verbose_name='Позиций в очереди')),
+            ],
+            options={
+                'verbose_name': 'Сброс очереди позиций',
+                'verbose_name_plural': 'Сбросы очереди позиций',
+            },
+        ),
+    ]
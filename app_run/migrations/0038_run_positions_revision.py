@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 19:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_run', '0037_positionflush'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='run',
+            name='positions_revision',
+            field=models.PositiveIntegerField(default=0, verbose_name='Ревизия позиций'),
+        ),
+    ]
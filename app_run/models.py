@@ -1,8 +1,11 @@
 from django.contrib.auth import get_user_model
+from django.core.files.storage import FileSystemStorage
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 
 user = get_user_model()
+import_storage = FileSystemStorage()
 
 
 class Run(models.Model):
@@ -19,8 +22,19 @@ class Run(models.Model):
     distance = models.FloatField(blank=True, null=True, verbose_name='Расстояние')
     run_time_seconds = models.PositiveSmallIntegerField(default=0, verbose_name='Время забега')
     speed = models.FloatField(default=0, verbose_name='Средняя скорость забега')
+    positions_count = models.PositiveIntegerField(default=0, verbose_name='Количество позиций')
+    track_distance = models.FloatField(default=0, verbose_name='Пройденное расстояние')
+    speed_sum = models.FloatField(default=0, verbose_name='Сумма скоростей')
+    first_position_at = models.DateTimeField(blank=True, null=True, verbose_name='Время первой позиции')
+    last_position_at = models.DateTimeField(blank=True, null=True, verbose_name='Время последней позиции')
+    positions_revision = models.PositiveIntegerField(default=0, verbose_name='Ревизия позиций')
 
     class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='run_created_at_idx'),
+            models.Index(fields=['athlete', 'status', 'created_at'], name='run_athlete_status_created_idx'),
+            models.Index(fields=['status', 'created_at', 'id'], name='run_status_created_at_idx')
+        ]
         verbose_name = 'Забег'
         verbose_name_plural = 'Забеги'
 
@@ -40,10 +54,40 @@ class Challenge(models.Model):
     athlete = models.ForeignKey(user, on_delete=models.CASCADE, related_name='challenges', verbose_name='Атлет')
 
     class Meta:
+        constraints = [models.UniqueConstraint(fields=['athlete', 'full_name'], name='unique_athlete_challenge')]
+        indexes = [models.Index(fields=['full_name', 'athlete'], name='challenge_name_athlete_idx')]
         verbose_name = 'Челлендж'
         verbose_name_plural = 'Челленджи'
 
 
+class AthleteStats(models.Model):
+    athlete = models.OneToOneField(user, on_delete=models.CASCADE, related_name='stats', verbose_name='Атлет')
+    runs_finished = models.PositiveIntegerField(default=0, verbose_name='Завершённые забеги')
+    total_distance = models.FloatField(default=0, verbose_name='Общее расстояние')
+    longest_run = models.FloatField(blank=True, null=True, verbose_name='Самый длинный забег')
+    avg_speed = models.FloatField(blank=True, null=True, verbose_name='Средняя скорость')
+    rating_avg = models.FloatField(blank=True, null=True, verbose_name='Средний рейтинг')
+    rating_count = models.PositiveIntegerField(default=0, verbose_name='Количество оценок')
+
+    class Meta:
+        verbose_name = 'Статистика атлета'
+        verbose_name_plural = 'Статистика атлетов'
+
+
+class AthleteDailyRollup(models.Model):
+    athlete = models.ForeignKey(user, on_delete=models.CASCADE, related_name='daily_rollups', verbose_name='Атлет')
+    day = models.DateField(verbose_name='День')
+    runs = models.PositiveIntegerField(default=0, verbose_name='Завершённые забеги')
+    distance = models.FloatField(default=0, verbose_name='Расстояние')
+    run_time_seconds = models.PositiveIntegerField(default=0, verbose_name='Время забегов')
+    speed_sum = models.FloatField(default=0, verbose_name='Сумма средних скоростей')
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['athlete', 'day'], name='unique_athlete_day')]
+        verbose_name = 'Дневная сводка атлета'
+        verbose_name_plural = 'Дневные сводки атлетов'
+
+
 class Position(models.Model):
     run = models.ForeignKey(Run, on_delete=models.CASCADE, related_name='positions', verbose_name='Забег')
     latitude = models.DecimalField(max_digits=6, decimal_places=4, verbose_name='Широта')
@@ -53,13 +97,52 @@ class Position(models.Model):
     distance = models.FloatField(default=0, verbose_name='Расстояние')
 
     class Meta:
+        indexes = [models.Index(fields=['run', 'date_time', 'id'], name='position_run_date_time_idx')]
         verbose_name = 'Позиция'
         verbose_name_plural = 'Позиции'
 
 
+class RunTrack(models.Model):
+    run = models.OneToOneField(Run, on_delete=models.CASCADE, related_name='track', verbose_name='Забег')
+    data = models.BinaryField(verbose_name='Упакованный трек')
+    points = models.PositiveIntegerField(default=0, verbose_name='Количество позиций')
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата и время архивации')
+
+    class Meta:
+        verbose_name = 'Архивный трек'
+        verbose_name_plural = 'Архивные треки'
+
+
+class PendingPosition(models.Model):
+    run = models.ForeignKey(Run, on_delete=models.CASCADE, related_name='pending_positions', verbose_name='Забег')
+    latitude = models.DecimalField(max_digits=6, decimal_places=4, verbose_name='Широта')
+    longitude = models.DecimalField(max_digits=7, decimal_places=4, verbose_name='Долгота')
+    date_time = models.DateTimeField(verbose_name='Дата и время')
+    received_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата и время получения')
+
+    class Meta:
+        indexes = [models.Index(fields=['run', 'date_time', 'id'], name='pending_run_date_time_idx')]
+        verbose_name = 'Позиция в очереди'
+        verbose_name_plural = 'Позиции в очереди'
+
+
+class PositionFlush(models.Model):
+    flushed_at = models.DateTimeField(verbose_name='Дата и время сброса')
+    positions = models.PositiveIntegerField(default=0, verbose_name='Сохранено позиций')
+    dropped = models.PositiveIntegerField(default=0, verbose_name='Отброшено позиций')
+    runs = models.PositiveIntegerField(default=0, verbose_name='Количество забегов')
+    duration_seconds = models.FloatField(default=0, verbose_name='Длительность, с')
+    max_latency_seconds = models.FloatField(default=0, verbose_name='Максимальная задержка, с')
+    depth = models.PositiveIntegerField(default=0, verbose_name='Позиций в очереди')
+
+    class Meta:
+        verbose_name = 'Сброс очереди позиций'
+        verbose_name_plural = 'Сбросы очереди позиций'
+
+
 class CollectibleItem(models.Model):
     name = models.CharField(max_length=255, verbose_name='Наименование')
-    uid = models.CharField(max_length=10, verbose_name='Идентификатор')
+    uid = models.CharField(max_length=10, unique=True, verbose_name='Идентификатор')
     latitude = models.FloatField(verbose_name='Широта')
     longitude = models.FloatField(verbose_name='Долгота')
     picture = models.URLField(verbose_name='Изображение')
@@ -77,6 +160,7 @@ class Subscribe(models.Model):
 
     class Meta:
         unique_together = ['athlete', 'coach']
+        indexes = [models.Index(fields=['coach', 'athlete'], name='subscribe_coach_athlete_idx')]
         verbose_name = 'Подписка на тренера'
         verbose_name_plural = 'Подписки на тренера'
 
@@ -88,5 +172,48 @@ class CoachRating(models.Model):
                                               verbose_name='Рейтинг')
 
     class Meta:
+        indexes = [models.Index(fields=['coach', 'rating'], name='coachrating_coach_rating_idx')]
         verbose_name = 'Оценка тренера'
-        verbose_name_plural = 'Оценки тренера'
\ No newline at end of file
+        verbose_name_plural = 'Оценки тренера'
+
+
+class ResourceVersion(models.Model):
+    name = models.CharField(max_length=64, primary_key=True, verbose_name='Ресурс')
+    version = models.PositiveBigIntegerField(default=0, verbose_name='Версия')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата и время изменения')
+
+    class Meta:
+        verbose_name = 'Версия ресурса'
+        verbose_name_plural = 'Версии ресурсов'
+
+
+class ImportJob(models.Model):
+    STATUSES = [
+        ('pending', 'PENDING'),
+        ('processing', 'PROCESSING'),
+        ('finished', 'FINISHED'),
+        ('failed', 'FAILED')
+    ]
+    MODES = [
+        ('insert', 'INSERT'),
+        ('upsert', 'UPSERT')
+    ]
+
+    file = models.FileField(upload_to='imports/%Y/%m/%d/', storage=import_storage, blank=True, verbose_name='Файл')
+    file_name = models.CharField(max_length=255, verbose_name='Имя файла')
+    mode = models.CharField(max_length=6, choices=MODES, default='insert', verbose_name='Режим загрузки')
+    status = models.CharField(max_length=12, choices=STATUSES, default='pending', verbose_name='Статус')
+    rows_processed = models.PositiveIntegerField(default=0, verbose_name='Обработано строк')
+    items_created = models.PositiveIntegerField(default=0, verbose_name='Создано предметов')
+    items_updated = models.PositiveIntegerField(default=0, verbose_name='Обновлено предметов')
+    items_unchanged = models.PositiveIntegerField(default=0, verbose_name='Неизменённых предметов')
+    errors = models.JSONField(default=list, encoder=DjangoJSONEncoder, verbose_name='Ошибочные строки')
+    message = models.TextField(blank=True, verbose_name='Сообщение об ошибке')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата и время загрузки')
+    started_at = models.DateTimeField(blank=True, null=True, verbose_name='Дата и время начала обработки')
+    finished_at = models.DateTimeField(blank=True, null=True, verbose_name='Дата и время окончания обработки')
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'created_at'], name='importjob_status_created_idx')]
+        verbose_name = 'Загрузка предметов'
+        verbose_name_plural = 'Загрузки предметов'
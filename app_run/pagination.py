@@ -0,0 +1,136 @@
+import base64
+import json
+from datetime import datetime
+from datetime import timezone as dt_timezone
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class ProgressRunItemPagination(PageNumberPagination):
+    page_size_query_param = 'size'
+
+
+class KeysetPagination(BasePagination):
+    ordering = ('id', )
+    page_size = None
+    page_size_query_param = 'size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    legacy_query_param = 'pagination'
+    legacy_pagination_class = ProgressRunItemPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.legacy = None
+        if (request.query_params.get(self.legacy_query_param) == 'page'
+                or self.legacy_pagination_class.page_query_param in request.query_params):
+            self.legacy = self.legacy_pagination_class()
+            return self.legacy.paginate_queryset(queryset, request, view)
+
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.request = request
+        descending = self.is_descending(request, view)
+        model = queryset.model if not isinstance(queryset, list) else type(queryset[0]) if queryset else None
+        values, reverse = self.decode_cursor(request, model)
+        backwards = descending != reverse
+
+        if isinstance(queryset, list):
+            rows = sorted(queryset, key=self.get_key, reverse=backwards)
+            if values is not None:
+                rows = [row for row in rows if (self.get_key(row) < values if backwards else self.get_key(row) > values)]
+        else:
+            rows = queryset.order_by(*[f'-{field}' if backwards else field for field in self.ordering])
+            if values is not None:
+                rows = rows.filter(self.keyset_filter(values, 'lt' if backwards else 'gt'))
+        rows = list(rows[:self.page_size + 1])
+
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+        self.next_key = self.get_key(rows[-1]) if rows and (has_more or reverse) else None
+        self.previous_key = self.get_key(rows[0]) if rows and (has_more if reverse else values is not None) else None
+        return rows
+
+    def get_paginated_response(self, data):
+        if self.legacy:
+            return self.legacy.get_paginated_response(data)
+        return Response({
+            'next': self.get_link(self.next_key, False),
+            'previous': self.get_link(self.previous_key, True),
+            'results': data
+        })
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size or 0))
+        except ValueError:
+            return self.page_size
+        return min(size, self.max_page_size) if size > 0 else self.page_size
+
+    def is_descending(self, request, view):
+        param = getattr(view, 'ordering_param', api_settings.ORDERING_PARAM)
+        fields = [field.strip() for field in request.query_params.get(param, '').split(',')]
+        return f'-{self.ordering[0]}' in fields
+
+    def get_key(self, row):
+        key = []
+        for field in self.ordering:
+            value = getattr(row, row._meta.get_field(field).attname)
+            key.append(value.isoformat(timespec='microseconds') if isinstance(value, datetime) else value)
+        return tuple(key)
+
+    def keyset_filter(self, values, lookup):
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            condition |= Q(**dict(zip(self.ordering[:index], values[:index])), **{f'{field}__{lookup}': values[index]})
+        return condition
+
+    def decode_cursor(self, request, model=None):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            values, reverse = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (TypeError, ValueError):
+            raise NotFound('Invalid cursor.')
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound('Invalid cursor.')
+        if model is not None:
+            try:
+                values = [self.clean_value(model, field, value) for field, value in zip(self.ordering, values)]
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound('Invalid cursor.')
+        return tuple(values), bool(reverse)
+
+    def clean_value(self, model, field, value):
+        value = model._meta.get_field(field).to_python(value)
+        if value is None:
+            raise ValueError(f'Missing cursor value for {field}.')
+        if isinstance(value, datetime):
+            if timezone.is_naive(value):
+                value = timezone.make_aware(value, dt_timezone.utc)
+            return value.astimezone(dt_timezone.utc).isoformat(timespec='microseconds')
+        return value
+
+    def get_link(self, key, reverse):
+        if key is None:
+            return None
+        cursor = base64.urlsafe_b64encode(json.dumps([list(key), reverse]).encode()).decode()
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+
+class PositionKeysetPagination(KeysetPagination):
+    ordering = ('run', 'date_time', 'id')
+
+
+class RunKeysetPagination(KeysetPagination):
+    ordering = ('created_at', 'id')
@@ -0,0 +1,77 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from app_run.models import AthleteDailyRollup, Run, Subscribe
+
+ROLLUP_FIELDS = ['runs', 'distance', 'run_time_seconds', 'speed_sum']
+PERIODS = {
+    'day': F('day'),
+    'week': TruncWeek('day'),
+    'month': TruncMonth('day')
+}
+
+
+def record_daily_rollup(run):
+    day = timezone.localdate(run.created_at)
+    increments = {
+        'runs': F('runs') + 1,
+        'distance': F('distance') + (run.distance or 0),
+        'run_time_seconds': F('run_time_seconds') + run.run_time_seconds,
+        'speed_sum': F('speed_sum') + run.speed
+    }
+    if AthleteDailyRollup.objects.filter(athlete_id=run.athlete_id, day=day).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            AthleteDailyRollup.objects.create(
+                athlete_id=run.athlete_id, day=day, runs=1, distance=run.distance or 0,
+                run_time_seconds=run.run_time_seconds, speed_sum=run.speed
+            )
+    except IntegrityError:
+        AthleteDailyRollup.objects.filter(athlete_id=run.athlete_id, day=day).update(**increments)
+
+
+@transaction.atomic
+def rebuild_daily_rollups(athlete_ids):
+    rows = Run.objects.filter(status='finished', athlete_id__in=athlete_ids).annotate(
+        day=TruncDate('created_at')
+    ).values('athlete', 'day').annotate(
+        runs=Count('id'), distance=Sum('distance'), run_time_seconds=Sum('run_time_seconds'), speed_sum=Sum('speed')
+    ).order_by()
+    AthleteDailyRollup.objects.filter(athlete_id__in=athlete_ids).delete()
+    return AthleteDailyRollup.objects.bulk_create([
+        AthleteDailyRollup(
+            athlete_id=row['athlete'], day=row['day'], runs=row['runs'], distance=row['distance'] or 0,
+            run_time_seconds=row['run_time_seconds'] or 0, speed_sum=row['speed_sum'] or 0
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+def get_series(period, start=None, end=None, athlete_id=None, coach_id=None):
+    rollups = AthleteDailyRollup.objects.all()
+    if athlete_id is not None:
+        rollups = rollups.filter(athlete_id=athlete_id)
+    if coach_id is not None:
+        rollups = rollups.filter(athlete_id__in=Subscribe.objects.filter(coach_id=coach_id).values('athlete_id'))
+    if start is not None:
+        rollups = rollups.filter(day__gte=timezone.localdate(start))
+    if end is not None:
+        rollups = rollups.filter(day__lt=timezone.localdate(end))
+    rows = rollups.annotate(period_start=PERIODS[period]).values('period_start').annotate(
+        athletes=Count('athlete', distinct=True), runs=Sum('runs'), distance=Sum('distance'),
+        run_time_seconds=Sum('run_time_seconds'), speed_sum=Sum('speed_sum')
+    ).order_by('period_start')
+    return [
+        {
+            'period_start': row['period_start'],
+            'athletes': row['athletes'],
+            'runs': row['runs'],
+            'distance': round(row['distance'], 3),
+            'run_time_seconds': row['run_time_seconds'],
+            'avg_speed': round(row['speed_sum'] / row['runs'], 2) if row['runs'] else None
+        }
+        for row in rows
+    ]
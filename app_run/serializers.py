@@ -1,8 +1,9 @@
 from django.contrib.auth.models import User
+from django.utils import timezone
 from rest_framework import serializers
 
 from app_run.models import (AthleteInfo, Challenge, CoachRating,
-                            CollectibleItem, Position, Run)
+                            CollectibleItem, ImportJob, Position, Run)
 
 
 class UserContractedSerializer(serializers.ModelSerializer):
@@ -16,7 +17,10 @@ class RunSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Run
-        fields = "__all__"
+        exclude = ("positions_count", "track_distance", "speed_sum",
+                   "first_position_at", "last_position_at",
+                   "positions_revision", )
+        read_only_fields = ("status", "distance", "run_time_seconds", "speed")
 
 
 class AthleteInfoSerializer(serializers.ModelSerializer):
@@ -27,7 +31,7 @@ class AthleteInfoSerializer(serializers.ModelSerializer):
         exclude = ("id", "user",)
 
     def get_user_id(self, obj):
-        return obj.user.id
+        return obj.user_id
 
     def validate_weight(self, value):
         if value <= 0 or value >= 900:
@@ -65,6 +69,11 @@ class PositionSerializer(serializers.ModelSerializer):
         return latitude
 
 
+class PositionBatchSerializer(PositionSerializer):
+    class Meta(PositionSerializer.Meta):
+        fields = ("id", "latitude", "longitude", "date_time", "distance", "speed")
+
+
 class CollectibleItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = CollectibleItem
@@ -128,4 +137,23 @@ class CoachDetailSerializer(UserSerializer):
 class CoachRatingSerilizer(serializers.ModelSerializer):
     class Meta:
         model = CoachRating
-        fields = ("athlete", "coach", "rating", )
\ No newline at end of file
+        fields = ("athlete", "coach", "rating", )
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    error_count = serializers.SerializerMethodField()
+    rows_per_second = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImportJob
+        fields = ("id", "file_name", "mode", "status", "rows_processed", "items_created", "items_updated",
+                  "items_unchanged", "error_count", "rows_per_second", "errors", "message", "created_at", "started_at", "finished_at", )
+
+    def get_error_count(self, obj):
+        return len(obj.errors)
+
+    def get_rows_per_second(self, obj):
+        if obj.started_at is None:
+            return None
+        elapsed = ((obj.finished_at or timezone.now()) - obj.started_at).total_seconds()
+        return round(obj.rows_processed / elapsed, 2) if elapsed > 0 else None
\ No newline at end of file
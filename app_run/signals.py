@@ -0,0 +1,84 @@
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_init,
+                                      post_save)
+from django.dispatch import receiver
+
+from django.contrib.auth.models import User
+
+from app_run import versions
+from app_run.analytics import coach_analytics_resource
+from app_run.challenges import clear_challenges_summary
+from app_run.ingest import clear_collected_items
+from app_run.leaderboards import clear_coach_leaderboards
+from app_run.models import Challenge, CoachRating, CollectibleItem, Subscribe
+from app_run.spatial import RESOURCE_NAME, collectible_item_index
+from app_run.stats import update_rating_stats
+
+
+@receiver([post_save, post_delete], sender=CollectibleItem)
+def collectible_item_changed(sender, **kwargs):
+    versions.bump(RESOURCE_NAME, versions.COLLECTIBLE_ITEMS)
+    collectible_item_index.invalidate()
+
+
+@receiver(m2m_changed, sender=CollectibleItem.athletes.through)
+def collected_items_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        athlete_ids = [instance.pk]
+    elif not reverse and action in ('post_add', 'post_remove'):
+        athlete_ids = list(pk_set)
+    elif not reverse and action == 'pre_clear':
+        athlete_ids = list(instance.athletes.values_list('id', flat=True))
+    else:
+        return
+    clear_collected_items(*athlete_ids)
+    versions.bump(versions.COLLECTIBLE_ITEMS, *map(versions.user_resource, athlete_ids))
+
+
+@receiver([post_save, post_delete], sender=Challenge)
+def challenges_summary_changed(sender, **kwargs):
+    clear_challenges_summary()
+
+
+SUMMARY_USER_FIELDS = ('first_name', 'last_name', 'username')
+
+
+def get_summary_fields(user):
+    return tuple(user.__dict__.get(field) for field in SUMMARY_USER_FIELDS)
+
+
+@receiver(post_init, sender=User)
+def user_loaded(sender, instance, **kwargs):
+    instance.loaded_summary_fields = get_summary_fields(instance)
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, created=False, **kwargs):
+    summary_fields = get_summary_fields(instance)
+    if created or kwargs['signal'] is post_delete or summary_fields != instance.loaded_summary_fields:
+        clear_challenges_summary()
+    instance.loaded_summary_fields = summary_fields
+    versions.bump(versions.user_resource(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Subscribe)
+def subscribe_changed(sender, instance, **kwargs):
+    clear_coach_leaderboards(instance.coach_id)
+    versions.bump(
+        coach_analytics_resource(instance.coach_id),
+        versions.user_resource(instance.athlete_id), versions.user_resource(instance.coach_id)
+    )
+
+
+@receiver(post_init, sender=CoachRating)
+def coach_rating_loaded(sender, instance, **kwargs):
+    instance.loaded_coach_id = instance.coach_id
+
+
+@receiver([post_save, post_delete], sender=CoachRating)
+def coach_rating_changed(sender, instance, **kwargs):
+    coach_ids = {instance.coach_id, instance.loaded_coach_id} - {None}
+    instance.loaded_coach_id = instance.coach_id
+    transaction.on_commit(lambda: update_rating_stats(
+        list(User.objects.filter(id__in=coach_ids).values_list('id', flat=True))
+    ))
@@ -0,0 +1,70 @@
+import math
+import threading
+import time
+from collections import defaultdict
+
+from app_run import geo, versions
+from app_run.models import CollectibleItem
+
+PICKUP_RADIUS = 100
+CELL_SIZE = 0.01
+METERS_PER_DEGREE = 111320
+VERSION_CHECK_INTERVAL = 1
+RESOURCE_NAME = 'collectible_item_locations'
+
+
+class CollectibleItemIndex:
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.columns = round(360 / cell_size)
+        self.cells = {}
+        self.version = None
+        self.checked_at = 0
+        self.lock = threading.Lock()
+
+    def cell(self, latitude, longitude):
+        return math.floor(latitude / self.cell_size), math.floor(longitude / self.cell_size) % self.columns
+
+    def rebuild(self, version):
+        cells = defaultdict(list)
+        for item_id, latitude, longitude in CollectibleItem.objects.values_list('id', 'latitude', 'longitude').iterator():
+            cells[self.cell(latitude, longitude)].append((item_id, latitude, longitude))
+        self.cells = dict(cells)
+        self.version = version
+
+    def invalidate(self):
+        self.version = None
+        self.checked_at = 0
+
+    def refresh(self):
+        now = time.monotonic()
+        if now - self.checked_at < VERSION_CHECK_INTERVAL:
+            return
+        with self.lock:
+            if now - self.checked_at < VERSION_CHECK_INTERVAL:
+                return
+            version = versions.get_version(RESOURCE_NAME)
+            if version != self.version:
+                self.rebuild(version)
+            self.checked_at = now
+
+    def candidates(self, latitude, longitude, radius):
+        lat_span = math.ceil(radius / (self.cell_size * METERS_PER_DEGREE))
+        lon_scale = max(math.cos(math.radians(latitude)), 1e-6)
+        lon_span = min(math.ceil(radius / (self.cell_size * METERS_PER_DEGREE * lon_scale)), self.columns // 2)
+        row, column = self.cell(latitude, longitude)
+        cells = self.cells
+        for i in range(row - lat_span, row + lat_span + 1):
+            for j in range(column - lon_span, column + lon_span + 1):
+                yield from cells.get((i, j % self.columns), ())
+
+    def nearby(self, latitude, longitude, radius=PICKUP_RADIUS):
+        self.refresh()
+        latitude, longitude = float(latitude), float(longitude)
+        return [
+            item_id for item_id, item_latitude, item_longitude in self.candidates(latitude, longitude, radius)
+            if round(geo.distance((item_latitude, item_longitude), (latitude, longitude)), 3) <= radius
+        ]
+
+
+collectible_item_index = CollectibleItemIndex()
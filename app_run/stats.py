@@ -0,0 +1,70 @@
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Sum
+
+from app_run import versions
+from app_run.models import AthleteStats, CoachRating, Run
+
+STATS_FIELDS = ['runs_finished', 'total_distance', 'longest_run', 'avg_speed', 'rating_avg', 'rating_count']
+
+
+@transaction.atomic
+def record_finished_run(run):
+    stats, created = AthleteStats.objects.select_for_update().get_or_create(athlete_id=run.athlete_id)
+    distance = run.distance or 0
+    stats.avg_speed = ((stats.avg_speed or 0) * stats.runs_finished + run.speed) / (stats.runs_finished + 1)
+    stats.runs_finished += 1
+    stats.total_distance += distance
+    stats.longest_run = max(stats.longest_run or 0, distance)
+    stats.save()
+    versions.bump(versions.user_resource(run.athlete_id))
+    return stats
+
+
+def rating_totals(coach_ids):
+    return {
+        row['coach']: row for row in CoachRating.objects.filter(coach_id__in=coach_ids)
+        .values('coach').annotate(rating_avg=Avg('rating'), rating_count=Count('rating')).order_by()
+    }
+
+
+@transaction.atomic
+def update_rating_stats(coach_ids):
+    totals = rating_totals(coach_ids)
+    AthleteStats.objects.bulk_create(
+        [
+            AthleteStats(
+                athlete_id=coach_id,
+                rating_avg=totals.get(coach_id, {}).get('rating_avg'),
+                rating_count=totals.get(coach_id, {}).get('rating_count') or 0
+            )
+            for coach_id in set(coach_ids)
+        ],
+        update_conflicts=True, unique_fields=['athlete'], update_fields=['rating_avg', 'rating_count']
+    )
+    versions.bump(*map(versions.user_resource, coach_ids))
+
+
+def rebuild_athlete_stats(athlete_ids):
+    runs = {
+        row['athlete']: row for row in Run.objects.filter(status='finished', athlete_id__in=athlete_ids)
+        .values('athlete').annotate(
+            runs_finished=Count('id'), total_distance=Sum('distance'),
+            longest_run=Max('distance'), avg_speed=Avg('speed')
+        ).order_by()
+    }
+    ratings = rating_totals(athlete_ids)
+    stats = []
+    for athlete_id in athlete_ids:
+        values = {**runs.get(athlete_id, {}), **ratings.get(athlete_id, {})}
+        stats.append(AthleteStats(
+            athlete_id=athlete_id,
+            runs_finished=values.get('runs_finished') or 0,
+            total_distance=values.get('total_distance') or 0,
+            longest_run=values.get('longest_run'),
+            avg_speed=values.get('avg_speed'),
+            rating_avg=values.get('rating_avg'),
+            rating_count=values.get('rating_count') or 0
+        ))
+    AthleteStats.objects.bulk_create(stats, update_conflicts=True, unique_fields=['athlete'], update_fields=STATS_FIELDS)
+    versions.bump(*map(versions.user_resource, athlete_ids))
+    return stats
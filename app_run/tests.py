@@ -1,3 +1,1534 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from importlib import import_module
+from io import BytesIO, StringIO
+from xml.etree import ElementTree
 
-# Create your tests here.
+import numpy as np
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.test import LiveServerTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from openpyxl import Workbook
+
+from app_run import geo, versions
+from app_run.analytics import coach_analytics_resource, get_coach_analytics
+from app_run.archive import FORMAT_VERSION, TRACK_FIELDS, iter_track, pack_track, unpack_track
+from app_run.ingest import collect_items, flush_pending_positions, get_collected_items
+from app_run.leaderboards import LocalBackend, get_backend
+from app_run.models import (AthleteDailyRollup, AthleteStats, Challenge, CoachRating, CollectibleItem, ImportJob,
+                            PendingPosition, Position, PositionFlush, ResourceVersion, Run, Subscribe)
+from app_run.rollups import rebuild_daily_rollups
+from app_run.spatial import RESOURCE_NAME, CollectibleItemIndex, collectible_item_index
+from app_run.stats import rebuild_athlete_stats
+from app_run.versions import get_version
+
+# (method, path, payload, max queries, max seconds)
+BUDGETS = [
+    ('get', '/api/company_details/', None, 0, 0.5),
+    ('post', '/api/upload_file/', 'workbook', 1, 1),
+    ('post', '/api/runs/{run_init}/start/', None, 3, 0.5),
+    ('post', '/api/runs/{run_in_progress}/stop/', None, 14, 0.5),
+    ('post', '/api/runs/{run_in_progress}/positions/batch/', 'fixes', 9, 0.5),
+    ('get', '/api/runs/{run_finished}/track.gpx', None, 3, 0.5),
+    ('get', '/api/runs/{run_finished}/track.ndjson', None, 3, 0.5),
+    ('get', '/api/positions/queue/', None, 2, 0.5),
+    ('post', '/api/subscribe_to_coach/{coach}/', {'athlete': '{free_athlete}'}, 5, 0.5),
+    ('get', '/api/challenges_summary/', None, 2, 0.5),
+    ('post', '/api/rate_coach/{coach}/', {'athlete': '{athlete}', 'rating': 4}, 18, 0.5),
+    ('get', '/api/analytics_for_coach/{coach}/', None, 3, 0.5),
+    ('get', '/api/analytics_for_coach/{coach}/?from=2024-01-01&to=2024-01-31', None, 3, 0.5),
+    ('get', '/api/leaderboards/distance/', None, 2, 0.5),
+    ('get', '/api/leaderboards/speed/?coach={coach}&size=50', None, 3, 0.5),
+    ('get', '/api/leaderboards/runs/?athlete={athlete}', None, 1, 0.5),
+    ('get', '/api/athlete_rollups/{athlete}/?period=day', None, 2, 0.5),
+    ('get', '/api/coach_rollups/{coach}/?period=month&from=2024-01-01&to=2024-12-31', None, 2, 0.5),
+    ('get', '/api/runs/', None, 1, 1),
+    ('get', '/api/runs/?size=50', None, 1, 0.5),
+    ('post', '/api/runs/', {'athlete': '{athlete}', 'comment': 'run'}, 2, 0.5),
+    ('get', '/api/runs/{run_finished}/', None, 1, 0.5),
+    ('get', '/api/runs/{run_finished}/?simplify=10', None, 3, 0.5),
+    ('get', '/api/users/', None, 1, 1),
+    ('get', '/api/users/?size=50', None, 2, 0.5),
+    ('get', '/api/users/{athlete}/', None, 5, 0.5),
+    ('get', '/api/users/{coach}/', None, 4, 0.5),
+    ('get', '/api/athlete_info/{athlete}/', None, 5, 0.5),
+    ('put', '/api/athlete_info/{athlete}/', {'goals': 'goal', 'weight': 70}, 12, 0.5),
+    ('get', '/api/challenges/', None, 1, 0.5),
+    ('get', '/api/challenges/?athlete={athlete}', None, 2, 0.5),
+    ('get', '/api/positions/?run={run_finished}', None, 3, 0.5),
+    ('get', '/api/positions/?run={run_finished}&size=100', None, 3, 0.5),
+    ('post', '/api/positions/', {'run': '{run_in_progress}', 'latitude': 55.75, 'longitude': 37.61,
+                                 'date_time': '2024-01-01T12:00:00.000000'}, 7, 0.5),
+    ('get', '/api/collectible_item/', None, 3, 1),
+]
+
+
+class CollectibleItemIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        collectible_item_index.invalidate()
+        self.athlete = User.objects.create_user(username='athlete')
+        self.run = Run.objects.create(athlete=self.athlete, comment='run', status='in_progress')
+
+    def create_item(self, uid, latitude, longitude):
+        return CollectibleItem.objects.create(name=uid, uid=uid, latitude=latitude, longitude=longitude,
+                                              picture='https://example.com/item.png', value=1)
+
+    def test_nearby_within_pickup_radius(self):
+        near = self.create_item('near', 55.7500, 37.6100)
+        edge = self.create_item('edge', 55.7508, 37.6100)
+        self.create_item('far', 55.7520, 37.6100)
+        self.assertEqual(sorted(collectible_item_index.nearby(55.75, 37.61)), sorted([near.id, edge.id]))
+
+    def test_nearby_across_antimeridian(self):
+        item = self.create_item('east', 10.0, 179.9999)
+        self.assertEqual(collectible_item_index.nearby(10.0, -179.9999), [item.id])
+
+    def test_item_changes_invalidate_index(self):
+        self.assertEqual(collectible_item_index.nearby(55.75, 37.61), [])
+        item = self.create_item('coin', 55.75, 37.61)
+        self.assertEqual(collectible_item_index.nearby(55.75, 37.61), [item.id])
+        item.latitude = 56
+        item.save()
+        self.assertEqual(collectible_item_index.nearby(55.75, 37.61), [])
+        self.assertEqual(collectible_item_index.nearby(56, 37.61), [item.id])
+        item.delete()
+        self.assertEqual(collectible_item_index.nearby(56, 37.61), [])
+
+    def test_version_bump_from_another_process(self):
+        index = CollectibleItemIndex()
+        self.assertEqual(index.nearby(55.75, 37.61), [])
+        item = CollectibleItem.objects.bulk_create([
+            CollectibleItem(name='coin', uid='coin', latitude=55.75, longitude=37.61,
+                            picture='https://example.com/item.png', value=1)
+        ])[0]
+        versions.bump(RESOURCE_NAME)
+        self.assertEqual(index.nearby(55.75, 37.61), [])
+        index.checked_at = 0
+        self.assertEqual(index.nearby(55.75, 37.61), [item.id])
+
+    def test_position_picks_up_item(self):
+        item = self.create_item('coin', 55.7501, 37.6101)
+        self.create_item('far', 56, 37.61)
+        response = self.client.post('/api/positions/', {
+            'run': self.run.id, 'latitude': 55.75, 'longitude': 37.61, 'date_time': '2024-01-01T12:00:00.000000'
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(list(self.athlete.items.values_list('id', flat=True)), [item.id])
+
+
+class PositionBatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.athlete = User.objects.create_user(username='athlete')
+        self.run = Run.objects.create(athlete=self.athlete, comment='run', status='in_progress')
+        self.path = f'/api/runs/{self.run.id}/positions/batch/'
+
+    def fix(self, latitude, second, longitude=37.61):
+        return {'latitude': latitude, 'longitude': longitude, 'date_time': f'2024-01-01T12:00:{second:02d}.000000'}
+
+    def post(self, *fixes):
+        return self.client.post(self.path, list(fixes), content_type='application/json')
+
+    def test_speed_and_distance(self):
+        segment = geo.distance((55.75, 37.61), (55.751, 37.61))
+        response = self.post(self.fix(55.75, 0), self.fix(55.751, 10), self.fix(55.752, 20))
+        self.assertEqual(response.status_code, 201)
+        positions = response.json()
+        self.assertEqual([position['speed'] for position in positions],
+                         [0, round(round(segment, 2) / 10, 2), round(round(segment, 2) / 10, 2)])
+        self.assertAlmostEqual(positions[2]['distance'], 2 * segment / 1000, places=4)
+
+        response = self.post(self.fix(55.753, 30))
+        self.assertAlmostEqual(response.json()[0]['distance'], 3 * segment / 1000, places=4)
+        self.run.refresh_from_db()
+        self.assertEqual(self.run.positions_count, 4)
+        self.assertAlmostEqual(self.run.track_distance, 3 * segment / 1000, places=4)
+
+    def test_invalid_fix_errors(self):
+        response = self.post(self.fix(55.75, 0), self.fix(95, 10))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), [{}, {'latitude': ['Latitude has to be between -90.0 and 90.0.']}])
+        self.assertFalse(Position.objects.exists())
+
+    def test_out_of_order_fixes_rejected(self):
+        response = self.post(self.fix(55.75, 10), self.fix(55.751, 5), self.fix(55.752, 10), self.fix(55.753, 20))
+        self.assertEqual(response.status_code, 400)
+        error = {'date_time': ['Date and time has to be later than the previous fix.']}
+        self.assertEqual(response.json(), [{}, error, error, {}])
+        self.assertFalse(Position.objects.exists())
+
+        self.assertEqual(self.post(self.fix(55.75, 10)).status_code, 201)
+        self.assertEqual(self.post(self.fix(55.751, 10)).json(), [error])
+        self.assertEqual(Position.objects.count(), 1)
+
+
+class RunStateCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.athlete = User.objects.create_user(username='athlete')
+        self.run = Run.objects.create(athlete=self.athlete, comment='run', status='in_progress')
+
+    def post(self, latitude, second):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/positions/', {
+                'run': self.run.id, 'latitude': latitude, 'longitude': 37.61,
+                'date_time': f'2024-01-01T12:00:{second:02d}.000000'
+            })
+
+    def tail_queries(self, queries):
+        return [query for query in queries.captured_queries
+                if 'FROM "app_run_position"' in query['sql'] and 'ORDER BY' in query['sql']]
+
+    def test_cached_tail_skips_query(self):
+        self.post(55.75, 0)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post(55.751, 10)
+        self.assertEqual(self.tail_queries(queries), [])
+        self.assertGreater(response.json()['distance'], 0)
+
+    def test_stale_tail_is_reloaded(self):
+        self.post(55.75, 0)
+        segment = geo.distance((55.75, 37.61), (55.76, 37.61)) / 1000
+        Position.objects.create(run=self.run, latitude=55.76, longitude=37.61, speed=10, distance=segment,
+                                date_time=datetime(2024, 1, 1, 12, 0, 5, tzinfo=timezone.utc))
+        Run.objects.filter(pk=self.run.pk).update(
+            positions_count=2, track_distance=segment, positions_revision=F('positions_revision') + 1
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post(55.76, 10)
+        self.assertEqual(len(self.tail_queries(queries)), 1)
+        self.assertAlmostEqual(response.json()['distance'], segment)
+        self.assertEqual(response.json()['speed'], 0)
+
+    def test_deleted_tail_is_reloaded(self):
+        self.post(55.75, 0)
+        tail = Position.objects.get(pk=self.post(55.76, 10).json()['id'])
+        self.assertEqual(self.client.delete(f'/api/positions/{tail.id}/').status_code, 204)
+        cache.set(f'run_state:{self.run.id}', {
+            'latitude': tail.latitude, 'longitude': tail.longitude, 'date_time': tail.date_time,
+            'distance': tail.distance, 'revision': 2
+        })
+        response = self.post(55.75, 20)
+        self.assertEqual((response.json()['distance'], response.json()['speed']), (0, 0))
+
+
+class PositionEditTests(TestCase):
+    points = [(55.75, 37.61), (55.751, 37.61), (55.752, 37.612), (55.753, 37.612)]
+
+    def setUp(self):
+        cache.clear()
+        self.athlete = User.objects.create_user(username='athlete')
+        self.run = Run.objects.create(athlete=self.athlete, comment='run', status='in_progress')
+        self.ids = [self.post(self.run, latitude, longitude, index * 10) for index, (latitude, longitude)
+                    in enumerate(self.points)]
+
+    def post(self, run, latitude, longitude, second):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/positions/', {
+                'run': run.id, 'latitude': latitude, 'longitude': longitude,
+                'date_time': f'2024-01-01T12:00:{second:02d}.000000'
+            }).json()['id']
+
+    def assertTrackOf(self, points):
+        other = Run.objects.create(athlete=self.athlete, comment='run', status='in_progress')
+        for index, (latitude, longitude, second) in enumerate(points):
+            self.post(other, latitude, longitude, second)
+        fields = ('positions_count', 'track_distance', 'speed_sum', 'first_position_at', 'last_position_at')
+        self.assertEqual(Run.objects.values_list(*fields).get(pk=self.run.pk),
+                         Run.objects.values_list(*fields).get(pk=other.pk))
+        self.assertEqual(list(self.run.positions.order_by('date_time').values_list('distance', 'speed')),
+                         list(other.positions.order_by('date_time').values_list('distance', 'speed')))
+        return other
+
+    def test_update_rebuilds_track(self):
+        revision = Run.objects.get(pk=self.run.pk).positions_revision
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/positions/{self.ids[1]}/', {'latitude': 55.7515},
+                                         content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Run.objects.get(pk=self.run.pk).positions_revision, revision + 1)
+        points = [(latitude, longitude, index * 10) for index, (latitude, longitude) in enumerate(self.points)]
+        points[1] = (55.7515, 37.61, 10)
+        self.assertTrackOf(points)
+
+    def test_update_moves_position_between_runs(self):
+        other = Run.objects.create(athlete=self.athlete, comment='run', status='in_progress')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/positions/{self.ids[3]}/', {'run': other.id}, content_type='application/json')
+        self.assertEqual(Run.objects.get(pk=other.pk).positions_count, 1)
+        self.assertTrackOf([(latitude, longitude, index * 10) for index, (latitude, longitude) in enumerate(self.points[:3])])
+
+    def test_delete_rebuilds_track(self):
+        for index in (3, 0):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(self.client.delete(f'/api/positions/{self.ids[index]}/').status_code, 204)
+        self.assertTrackOf([(latitude, longitude, index * 10) for index, (latitude, longitude)
+                            in enumerate(self.points) if index in (1, 2)])
+        self.assertEqual(Position.objects.get(id=self.ids[1]).distance, 0)
+        self.post(self.run, 55.753, 37.612, 30)
+        self.assertTrackOf([(55.751, 37.61, 10), (55.752, 37.612, 20), (55.753, 37.612, 30)])
+
+    def test_finished_run_is_read_only(self):
+        Run.objects.filter(pk=self.run.pk).update(status='finished')
+        self.assertEqual(self.client.delete(f'/api/positions/{self.ids[0]}/').status_code, 400)
+        response = self.client.patch(f'/api/positions/{self.ids[0]}/', {'latitude': 55.7}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Position.objects.filter(run=self.run).count(), 4)
+
+
+class RunTotalsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.athlete = User.objects.create_user(username='athlete')
+        self.run = Run.objects.create(athlete=self.athlete, comment='run', status='in_progress')
+        for second, (latitude, longitude) in enumerate([(55.75, 37.61), (55.7512, 37.6135), (55.7561, 37.6204)]):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post('/api/positions/', {
+                    'run': self.run.id, 'latitude': latitude, 'longitude': longitude,
+                    'date_time': f'2024-01-01T12:00:{second * 10:02d}.000000'
+                })
+
+    def test_recompute_keeps_ingested_totals(self):
+        fields = ('positions_count', 'track_distance', 'speed_sum', 'first_position_at', 'last_position_at')
+        before = Run.objects.values_list(*fields).get(pk=self.run.pk)
+        call_command('recompute_run_totals', run_ids=[self.run.id], stdout=StringIO())
+        after = Run.objects.values_list(*fields).get(pk=self.run.pk)
+        self.assertEqual(before[0], after[0])
+        self.assertAlmostEqual(before[1], after[1], places=9)
+        self.assertEqual(before[2:], after[2:])
+
+    def test_recompute_keeps_batch_totals(self):
+        fields = ('positions_count', 'track_distance', 'speed_sum', 'first_position_at', 'last_position_at')
+        fixes = [
+            {'latitude': 55.75 + index / 1000, 'longitude': 37.61 + index / 700,
+             'date_time': f'2024-01-01T12:00:{index * 5:02d}.000000'}
+            for index in range(12)
+        ]
+        for engine in ('geodesic', 'numpy_haversine'):
+            with self.subTest(engine=engine), self.settings(GEO_ENGINE=engine):
+                run = Run.objects.create(athlete=self.athlete, comment='run', status='in_progress')
+                for batch in (fixes[:5], fixes[5:]):
+                    self.client.post(f'/api/runs/{run.id}/positions/batch/', batch, content_type='application/json')
+                before = Run.objects.values_list(*fields).get(pk=run.pk)
+                call_command('recompute_run_totals', run_ids=[run.id], stdout=StringIO())
+                self.assertEqual(Run.objects.values_list(*fields).get(pk=run.pk), before)
+
+    def test_internal_counters_are_not_exposed(self):
+        response = self.client.post(f'/api/runs/{self.run.id}/stop/')
+        self.assertEqual(response.status_code, 200)
+        for payload in (response.json(), self.client.get(f'/api/runs/{self.run.id}/').json()):
+            self.assertEqual(
+                set(payload) & {'positions_count', 'track_distance', 'speed_sum', 'first_position_at', 'last_position_at'},
+                set()
+            )
+            self.assertEqual(payload['run_time_seconds'], 20)
+
+
+class GeoEngineTests(TestCase):
+    points = [(55.75, 37.61), (55.7512, 37.6135), (55.7561, 37.6204)]
+
+    def setUp(self):
+        cache.clear()
+        self.athlete = User.objects.create_user(username='athlete')
+        self.run = Run.objects.create(athlete=self.athlete, comment='run', status='in_progress')
+
+    def test_engines_agree(self):
+        latitudes, longitudes = zip(*self.points)
+        expected = geo.get_engine('geodesic').segments(latitudes, longitudes)
+        for name, engine in geo.ENGINES.items():
+            with self.subTest(engine=name):
+                self.assertTrue(np.allclose(engine.segments(latitudes, longitudes), expected, rtol=0.005))
+                self.assertAlmostEqual(engine.distance(*self.points[:2]), expected[0], delta=expected[0] * 0.005)
+
+    def ingest(self, mode):
+        Position.objects.all().delete()
+        Run.objects.filter(pk=self.run.pk).update(positions_count=0, track_distance=0, speed_sum=0)
+        cache.clear()
+        fixes = [
+            {'latitude': latitude, 'longitude': longitude, 'date_time': f'2024-01-01T12:00:{second:02d}.000000'}
+            for second, (latitude, longitude) in enumerate(self.points)
+        ]
+        if mode == 'batch':
+            self.client.post(f'/api/runs/{self.run.id}/positions/batch/', fixes, content_type='application/json')
+        else:
+            with self.settings(POSITION_INGEST_MODE=mode):
+                for fix in fixes:
+                    self.client.post('/api/positions/', {'run': self.run.id, **fix})
+            flush_pending_positions(self.run.id)
+        return list(Position.objects.order_by('date_time').values_list('distance', 'speed'))
+
+    def test_ingest_paths_use_geo_engine(self):
+        latitudes, longitudes = zip(*self.points)
+        for name in ('geodesic', 'numpy_haversine', 'numpy_equirectangular'):
+            with self.subTest(engine=name), self.settings(GEO_ENGINE=name):
+                self.assertTrue(np.array_equal(geo.segment_distances(latitudes, longitudes),
+                                               geo.get_engine(name).segments(latitudes, longitudes)))
+                tracks = {mode: self.ingest(mode) for mode in ('sync', 'batch', 'buffered')}
+                expected = np.round(geo.get_engine(name).segments(latitudes, longitudes), 2).sum() / 1000
+                self.assertAlmostEqual(tracks['sync'][-1][0], expected, places=9)
+                self.assertEqual(tracks['batch'], tracks['sync'])
+                self.assertEqual(tracks['buffered'], tracks['sync'])
+
+
+class CollectedItemsCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        collectible_item_index.invalidate()
+        self.athlete = User.objects.create_user(username='athlete')
+        self.items = CollectibleItem.objects.bulk_create([
+            CollectibleItem(name=uid, uid=uid, latitude=55.75, longitude=37.61 + index * 0.01,
+                            picture='https://example.com/item.png', value=1)
+            for index, uid in enumerate(('first', 'second'))
+        ])
+
+    def collect(self, longitude):
+        with self.captureOnCommitCallbacks(execute=True):
+            collect_items(self.athlete, [{'latitude': 55.75, 'longitude': longitude}])
+
+    def test_cached_set_skips_query(self):
+        self.collect(37.61)
+        self.assertEqual(get_collected_items(self.athlete), {self.items[0].id})
+        with self.assertNumQueries(0):
+            self.collect(37.61)
+
+    def test_pickup_extends_cached_set(self):
+        self.collect(37.61)
+        self.collect(37.62)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_collected_items(self.athlete), {item.id for item in self.items})
+
+    def test_m2m_changes_clear_cached_set(self):
+        self.collect(37.61)
+        self.items[0].athletes.remove(self.athlete)
+        self.assertEqual(get_collected_items(self.athlete), set())
+        self.athlete.items.add(self.items[1])
+        self.assertEqual(get_collected_items(self.athlete), {self.items[1].id})
+
+    def test_cached_set_expires(self):
+        get_collected_items(self.athlete)
+        CollectibleItem.athletes.through.objects.create(collectibleitem=self.items[0], user=self.athlete)
+        self.assertEqual(get_collected_items(self.athlete), set())
+        with self.settings(COLLECTED_ITEMS_TIMEOUT=0):
+            cache.clear()
+            get_collected_items(self.athlete)
+            CollectibleItem.athletes.through.objects.create(collectibleitem=self.items[1], user=self.athlete)
+            self.assertEqual(get_collected_items(self.athlete), {item.id for item in self.items})
+
+
+@override_settings(POSITION_INGEST_MODE='buffered')
+class BufferedIngestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.athlete = User.objects.create_user(username='athlete')
+        self.run = Run.objects.create(athlete=self.athlete, comment='run', status='in_progress')
+
+    def post(self, latitude, second):
+        return self.client.post('/api/positions/', {
+            'run': self.run.id, 'latitude': latitude, 'longitude': 37.61,
+            'date_time': f'2024-01-01T12:00:{second:02d}.000000'
+        })
+
+    def test_fix_is_queued(self):
+        response = self.post(55.75, 0)
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(Position.objects.exists())
+        self.assertEqual(PendingPosition.objects.count(), 1)
+        queue = self.client.get('/api/positions/queue/').json()
+        self.assertEqual((queue['mode'], queue['depth'], queue['runs']), ('buffered', 1, 1))
+
+    def test_flush_orders_by_time(self):
+        for latitude, second in ((55.752, 20), (55.75, 0), (55.751, 10)):
+            self.post(latitude, second)
+        pending, dropped = flush_pending_positions(self.run.id)
+        self.assertEqual((len(pending), dropped), (3, []))
+        self.assertFalse(PendingPosition.objects.exists())
+        positions = list(Position.objects.order_by('date_time'))
+        self.assertEqual([float(position.latitude) for position in positions], [55.75, 55.751, 55.752])
+        self.assertEqual(positions[0].distance, 0)
+        self.assertLess(positions[1].distance, positions[2].distance)
+        self.assertTrue(all(position.speed > 0 for position in positions[1:]))
+        self.run.refresh_from_db()
+        self.assertEqual(self.run.positions_count, 3)
+
+    def test_flush_limit_and_late_fixes(self):
+        for second in range(4):
+            self.post(55.75 + second / 1000, second * 10)
+        self.assertEqual(len(flush_pending_positions(self.run.id, limit=3)[0]), 3)
+        self.assertEqual((Position.objects.count(), PendingPosition.objects.count()), (3, 1))
+        self.post(55.76, 5)
+        pending, dropped = flush_pending_positions(self.run.id)
+        self.assertEqual((len(pending), [float(fix.latitude) for fix in dropped]), (2, [55.76]))
+        self.assertEqual(Position.objects.count(), 4)
+        self.assertFalse(Position.objects.filter(latitude=55.76).exists())
+        self.assertFalse(PendingPosition.objects.exists())
+
+    def test_flush_command(self):
+        self.post(55.75, 0)
+        self.post(55.751, 10)
+        output = StringIO()
+        call_command('flush_positions', once=True, stdout=output)
+        self.assertIn('Flushed 2 positions of 1 runs', output.getvalue())
+        self.assertEqual(Position.objects.count(), 2)
+        last_flush = self.client.get('/api/positions/queue/').json()['last_flush']
+        self.assertEqual((last_flush['positions'], last_flush['dropped'], last_flush['depth']), (2, 0, 0))
+
+    def test_flush_stats_are_shared(self):
+        self.assertIsNone(self.client.get('/api/positions/queue/').json()['last_flush'])
+        self.post(55.75, 10)
+        call_command('flush_positions', once=True, stdout=StringIO())
+        self.post(55.751, 20)
+        self.post(55.752, 0)
+        output = StringIO()
+        call_command('flush_positions', once=True, stdout=output)
+        self.assertIn('dropped 1 out of order', output.getvalue())
+        cache.clear()
+        last_flush = self.client.get('/api/positions/queue/').json()['last_flush']
+        self.assertEqual((last_flush['positions'], last_flush['dropped'], last_flush['runs']), (1, 1, 1))
+        self.assertEqual(PositionFlush.objects.count(), 1)
+
+    def test_stop_flushes_queue(self):
+        self.post(55.75, 0)
+        self.post(55.751, 10)
+        response = self.client.post(f'/api/runs/{self.run.id}/stop/')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(response.json()['distance'], 0)
+        self.assertEqual(response.json()['run_time_seconds'], 10)
+        self.assertFalse(PendingPosition.objects.exists())
+
+
+class RunTrackArchiveTests(TestCase):
+    def setUp(self):
+        self.athlete = User.objects.create_user(username='athlete')
+        self.run = Run.objects.create(athlete=self.athlete, comment='run', status='finished')
+        start = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+        Position.objects.bulk_create(Position(
+            run=self.run, latitude=55.75 + index / 1000, longitude=-37.6123 - index / 1000,
+            date_time=start + timedelta(seconds=index * 7, microseconds=index * 1001),
+            speed=round(index * 1.37, 2), distance=round(index * 0.01234, 5)
+        ) for index in range(50))
+
+    def track(self):
+        return list(self.run.positions.order_by('date_time', 'id').values_list(*TRACK_FIELDS))
+
+    def test_round_trip(self):
+        rows = self.track()
+        self.assertEqual(list(unpack_track(pack_track(rows))), rows)
+        self.assertEqual(list(unpack_track(pack_track([]))), [])
+
+    def test_archive_command(self):
+        rows = self.track()
+        positions = self.client.get('/api/positions/', {'run': self.run.id}).json()
+        output = StringIO()
+        call_command('archive_runs', days=0, stdout=output)
+        self.assertIn('Archived 1 runs with 50 positions', output.getvalue())
+        self.assertFalse(Position.objects.exists())
+        self.assertEqual(self.run.track.points, 50)
+        self.assertEqual(list(iter_track(self.run.id)), rows)
+        self.assertEqual(self.client.get('/api/positions/', {'run': self.run.id}).json(), positions)
+
+    def test_unsupported_version(self):
+        data = bytearray(pack_track(self.track()))
+        data[0] = FORMAT_VERSION + 1
+        with self.assertRaisesMessage(ValueError, 'Unsupported track format version'):
+            list(unpack_track(bytes(data)))
+
+
+class RunTrackExportTests(TestCase):
+    def setUp(self):
+        self.athlete = User.objects.create_user(username='athlete')
+        self.run = Run.objects.create(athlete=self.athlete, comment='Tom & Jerry <run> "fast"', status='finished')
+        start = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+        Position.objects.bulk_create(Position(
+            run=self.run, latitude=55.75 + index / 1000, longitude=37.61, date_time=start + timedelta(seconds=index),
+            speed=index, distance=index / 100
+        ) for index in range(3))
+
+    def export(self, export_format):
+        response = self.client.get(f'/api/runs/{self.run.id}/track.{export_format}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="run_{self.run.id}.{export_format}"')
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_ndjson(self):
+        response, content = self.export('ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([line['latitude'] for line in lines], [55.75, 55.751, 55.752])
+        self.assertEqual(lines[1]['date_time'], '2024-01-01T12:00:01.000000Z')
+        self.assertEqual((lines[2]['speed'], lines[2]['distance']), (2, 0.02))
+
+    def test_gpx_escapes_name(self):
+        response, content = self.export('gpx')
+        self.assertEqual(response['Content-Type'], 'application/gpx+xml')
+        namespace = {'gpx': 'http://www.topografix.com/GPX/1/1'}
+        root = ElementTree.fromstring(content)
+        self.assertEqual(root.find('gpx:trk/gpx:name', namespace).text, self.run.comment)
+        points = root.findall('gpx:trk/gpx:trkseg/gpx:trkpt', namespace)
+        self.assertEqual([point.get('lat') for point in points], ['55.7500', '55.7510', '55.7520'])
+        self.assertEqual(points[0].find('gpx:time', namespace).text, '2024-01-01T12:00:00.000000Z')
+
+    def test_archived_track(self):
+        _, content = self.export('ndjson')
+        call_command('archive_runs', days=0, stdout=StringIO())
+        self.assertEqual(self.export('ndjson')[1], content)
+
+    def test_missing_run(self):
+        self.assertEqual(self.client.get('/api/runs/0/track.gpx').status_code, 404)
+
+
+class TrackSimplifyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.athlete = User.objects.create_user(username='athlete')
+        self.run = Run.objects.create(athlete=self.athlete, comment='run', status='finished')
+        start = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+        points = [(55.75 + index / 10000, 37.61) for index in range(10)] + [(55.7509, 37.6101), (55.7509, 37.62)]
+        Position.objects.bulk_create(Position(
+            run=self.run, latitude=latitude, longitude=longitude, date_time=start + timedelta(seconds=index)
+        ) for index, (latitude, longitude) in enumerate(points))
+
+    def track(self, tolerance):
+        response = self.client.get(f'/api/runs/{self.run.id}/', {'simplify': tolerance})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['track']
+
+    def test_simplify(self):
+        self.assertEqual(geo.simplify([55.75, 55.751], [37.61, 37.61], 1), [0, 1])
+        self.assertEqual(geo.simplify([55.75, 55.7505, 55.751], [37.61, 37.61, 37.61], 1), [0, 2])
+        self.assertEqual(geo.simplify([55.75, 55.7505, 55.751], [37.61, 37.62, 37.61], 1), [0, 1, 2])
+
+    def test_track_keeps_corners(self):
+        self.assertEqual(self.track(5), [[55.75, 37.61], [55.7509, 37.61], [55.7509, 37.62]])
+        self.assertEqual(len(self.track(1000)), 2)
+
+    def test_tolerance_levels(self):
+        self.track(7)
+        self.track(10)
+        self.track(10.0)
+        self.track(5000)
+        self.assertEqual(sorted(key for key in cache._cache if 'run_track' in key), sorted(
+            cache.make_key(f'run_track:{self.run.id}:{level}') for level in (10, 1000)
+        ))
+
+    def test_invalid_tolerance(self):
+        for tolerance in ('0', '-5', 'abc', 'inf', 'nan'):
+            response = self.client.get(f'/api/runs/{self.run.id}/', {'simplify': tolerance})
+            self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/positions/', {'simplify': 10})
+        self.assertEqual(response.status_code, 400)
+
+    def test_positions(self):
+        response = self.client.get('/api/positions/', {'run': self.run.id, 'simplify': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([position['latitude'] for position in response.json()], ['55.7500', '55.7509', '55.7509'])
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.athlete = User.objects.create_user(username='athlete')
+        self.runs = Run.objects.bulk_create(Run(athlete=self.athlete, comment=f'run {index}') for index in range(5))
+        created_at = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+        for index, run in enumerate(self.runs):
+            Run.objects.filter(id=run.id).update(created_at=created_at + timedelta(minutes=index // 2))
+
+    def cursor(self, values, reverse=False):
+        return base64.urlsafe_b64encode(json.dumps([values, reverse]).encode()).decode()
+
+    def test_next_and_previous(self):
+        page = self.client.get('/api/runs/', {'size': 2}).json()
+        ids = [run['id'] for run in page['results']]
+        while page['next']:
+            page = self.client.get(page['next']).json()
+            ids += [run['id'] for run in page['results']]
+        self.assertEqual(ids, [run.id for run in self.runs])
+        page = self.client.get(page['previous']).json()
+        self.assertEqual([run['id'] for run in page['results']], [run.id for run in self.runs[2:4]])
+
+    def test_cursor_values_are_normalized(self):
+        run = self.runs[1]
+        cursor = self.cursor(['2024-01-01T15:00:00+03:00', str(run.id)])
+        response = self.client.get('/api/runs/', {'size': 10, 'cursor': cursor})
+        self.assertEqual([run['id'] for run in response.json()['results']], [run.id for run in self.runs[2:]])
+
+    def test_invalid_cursor(self):
+        for cursor in ('abc', self.cursor(['2024-01-01T12:00:00']), self.cursor(['yesterday', 1]),
+                       self.cursor(['2024-01-01T12:00:00', 'one']), self.cursor([None, 1]),
+                       self.cursor([{'a': 1}, 1]), self.cursor([[1], 1])):
+            response = self.client.get('/api/runs/', {'size': 2, 'cursor': cursor})
+            self.assertEqual(response.status_code, 404, cursor)
+            self.assertEqual(response.json(), {'detail': 'Invalid cursor.'})
+
+
+class RunStopTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.athlete = User.objects.create_user(username='athlete')
+
+    def finish(self, distance, seconds, speed=10):
+        run = Run.objects.create(athlete=self.athlete, comment='run', status='in_progress')
+        started = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+        Run.objects.filter(id=run.id).update(
+            track_distance=distance, positions_count=2, speed_sum=speed * 2,
+            first_position_at=started, last_position_at=started + timedelta(seconds=seconds)
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/runs/{run.id}/stop/')
+        self.assertEqual(response.status_code, 200)
+        return run
+
+    def challenges(self):
+        return set(Challenge.objects.filter(athlete=self.athlete).values_list('full_name', flat=True))
+
+    def test_updates_athlete_stats(self):
+        self.finish(3, 1200, speed=4)
+        self.finish(5, 1800, speed=6)
+        stats = AthleteStats.objects.get(athlete=self.athlete)
+        self.assertEqual((stats.runs_finished, stats.total_distance, stats.longest_run), (2, 8, 5))
+        self.assertAlmostEqual(stats.avg_speed, 5)
+
+    def test_awards_challenges(self):
+        self.finish(2.5, 900)
+        self.assertEqual(self.challenges(), set())
+        self.finish(2.5, 500)
+        self.assertEqual(self.challenges(), {'2 километра за 10 минут!'})
+        for _ in range(8):
+            self.finish(6, 3600)
+        self.assertEqual(self.challenges(), {'2 километра за 10 минут!', 'Сделай 10 Забегов!', 'Пробеги 50 километров!'})
+        summary = self.client.get('/api/challenges_summary/').json()
+        self.assertEqual(sorted(challenge['name_to_display'] for challenge in summary), sorted(self.challenges()))
+
+    def test_second_stop_is_rejected(self):
+        run = self.finish(2.5, 500)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/runs/{run.id}/stop/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(AthleteStats.objects.get(athlete=self.athlete).runs_finished, 1)
+        self.assertEqual(Challenge.objects.filter(athlete=self.athlete).count(), 1)
+        self.assertEqual(AthleteDailyRollup.objects.get(athlete=self.athlete).runs, 1)
+
+    def test_invalid_run(self):
+        run = Run.objects.create(athlete=self.athlete, comment='run')
+        self.assertEqual(self.client.post(f'/api/runs/{run.id}/stop/').status_code, 400)
+        self.assertEqual(self.client.post('/api/runs/0/stop/').status_code, 404)
+        self.assertFalse(AthleteStats.objects.exists())
+
+    def test_finished_fields_are_read_only(self):
+        run = self.finish(2.5, 500)
+        response = self.client.patch(f'/api/runs/{run.id}/', {'status': 'init', 'distance': 10, 'comment': 'edited'},
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        run.refresh_from_db()
+        self.assertEqual((run.status, run.distance, run.comment), ('finished', 2.5, 'edited'))
+        other = Run.objects.create(athlete=self.athlete, comment='run')
+        self.client.patch(f'/api/runs/{other.id}/', {'status': 'finished'}, content_type='application/json')
+        self.assertEqual(Run.objects.get(id=other.id).status, 'init')
+        self.assertEqual(AthleteStats.objects.get(athlete=self.athlete).runs_finished, 1)
+
+    def test_finished_run_cannot_be_deleted(self):
+        run = self.finish(2.5, 500)
+        self.assertEqual(self.client.delete(f'/api/runs/{run.id}/').status_code, 400)
+        self.assertTrue(Run.objects.filter(id=run.id).exists())
+        other = Run.objects.create(athlete=self.athlete, comment='run')
+        self.assertEqual(self.client.delete(f'/api/runs/{other.id}/').status_code, 204)
+
+
+class RatingStatsTests(TestCase):
+    def setUp(self):
+        self.coaches = User.objects.bulk_create([User(username=f'coach_{index}', is_staff=True) for index in range(2)])
+        self.athletes = User.objects.bulk_create([User(username=f'athlete_{index}') for index in range(2)])
+
+    def rating(self, coach):
+        stats = AthleteStats.objects.filter(athlete=coach).values_list('rating_avg', 'rating_count').first()
+        return stats or (None, 0)
+
+    def test_signal_updates_stats(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = CoachRating.objects.create(athlete=self.athletes[0], coach=self.coaches[0], rating=5)
+            CoachRating.objects.create(athlete=self.athletes[1], coach=self.coaches[0], rating=2)
+        self.assertEqual(self.rating(self.coaches[0]), (3.5, 2))
+        first = CoachRating.objects.get(id=first.id)
+        first.coach = self.coaches[1]
+        with self.captureOnCommitCallbacks(execute=True):
+            first.save()
+        self.assertEqual((self.rating(self.coaches[0]), self.rating(self.coaches[1])), ((2, 1), (5, 1)))
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self.rating(self.coaches[1]), (None, 0))
+
+    def test_rate_coach_moves_rating(self):
+        for coach in self.coaches:
+            Subscribe.objects.create(athlete=self.athletes[0], coach=coach)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/rate_coach/{self.coaches[0].id}/', {'athlete': self.athletes[0].id, 'rating': 4})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/rate_coach/{self.coaches[1].id}/', {'athlete': self.athletes[0].id, 'rating': 3})
+        self.assertEqual((self.rating(self.coaches[0]), self.rating(self.coaches[1])), ((None, 0), (3, 1)))
+
+    def test_delete_rated_coach(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            CoachRating.objects.create(athlete=self.athletes[0], coach=self.coaches[0], rating=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.coaches[0].delete()
+        self.assertFalse(CoachRating.objects.exists())
+        self.assertFalse(AthleteStats.objects.filter(athlete_id=self.coaches[0].id).exists())
+        connection.check_constraints()
+
+    def test_migration_fills_stats(self):
+        Run.objects.bulk_create([
+            Run(athlete=self.athletes[0], comment='run', status='finished', distance=distance, speed=distance)
+            for distance in (2, 4)
+        ] + [Run(athlete=self.athletes[1], comment='run', status='in_progress', distance=9)])
+        CoachRating.objects.bulk_create([
+            CoachRating(athlete=athlete, coach=self.coaches[0], rating=rating) for athlete, rating in zip(self.athletes, (1, 4))
+        ])
+        AthleteStats.objects.all().delete()
+        migration = import_module('app_run.migrations.0035_fill_athletestats')
+        migration.fill_athlete_stats(apps, None)
+        fields = ('athlete', 'runs_finished', 'total_distance', 'longest_run', 'avg_speed', 'rating_avg', 'rating_count')
+        self.assertEqual(list(AthleteStats.objects.order_by('athlete').values_list(*fields)), [
+            (self.coaches[0].id, 0, 0, None, None, 2.5, 2), (self.athletes[0].id, 2, 6, 4, 3, None, 0)
+        ])
+
+
+class ChallengesSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.athletes = User.objects.bulk_create([
+            User(username=f'athlete_{index}', first_name='Ivan', last_name=f'Petrov {index}') for index in range(5)
+        ])
+        for athlete in self.athletes:
+            Challenge.objects.create(athlete=athlete, full_name='Сделай 10 Забегов!')
+        Challenge.objects.create(athlete=self.athletes[0], full_name='Пробеги 50 километров!')
+
+    def test_summary(self):
+        summary = self.client.get('/api/challenges_summary/').json()
+        self.assertEqual([group['name_to_display'] for group in summary], ['Пробеги 50 километров!', 'Сделай 10 Забегов!'])
+        self.assertEqual([athlete['id'] for athlete in summary[1]['athletes']], [athlete.id for athlete in self.athletes])
+        self.assertEqual(summary[0]['athletes'][0]['full_name'], 'Ivan Petrov 0')
+
+    def test_pagination(self):
+        response = self.client.get('/api/challenges_summary/', {'size': 2, 'full_name': 'Сделай 10 Забегов!'})
+        group, = response.json()
+        self.assertEqual((group['athletes_count'], group['previous']), (5, None))
+        self.assertEqual([athlete['id'] for athlete in group['athletes']], [athlete.id for athlete in self.athletes[:2]])
+        group, = self.client.get(group['next']).json()
+        group, = self.client.get(group['next']).json()
+        self.assertEqual([athlete['id'] for athlete in group['athletes']], [self.athletes[4].id])
+        self.assertIsNone(group['next'])
+        group, = self.client.get(group['previous']).json()
+        self.assertEqual([athlete['id'] for athlete in group['athletes']], [athlete.id for athlete in self.athletes[2:4]])
+
+    def test_invalidated_on_challenge(self):
+        self.client.get('/api/challenges_summary/')
+        Challenge.objects.filter(athlete=self.athletes[0]).delete()
+        summary = self.client.get('/api/challenges_summary/').json()
+        self.assertEqual([len(group['athletes']) for group in summary], [4])
+
+    def test_version_bumped_by_another_process(self):
+        self.client.get('/api/challenges_summary/')
+        Challenge.objects.bulk_create([Challenge(athlete=self.athletes[1], full_name='2 километра за 10 минут!')])
+        self.assertEqual(len(self.client.get('/api/challenges_summary/').json()), 2)
+        ResourceVersion.objects.filter(name=versions.CHALLENGES).update(version=F('version') + 1)
+        self.assertEqual(len(self.client.get('/api/challenges_summary/').json()), 3)
+
+    def test_invalidated_only_by_summary_fields(self):
+        version = versions.get_version(versions.CHALLENGES)
+        athlete = User.objects.get(id=self.athletes[0].id)
+        self.client.force_login(athlete)
+        athlete.email = 'athlete@example.com'
+        athlete.save()
+        self.assertEqual(versions.get_version(versions.CHALLENGES), version)
+        athlete.last_name = 'Sidorov'
+        athlete.save()
+        self.assertEqual(versions.get_version(versions.CHALLENGES), version + 1)
+        summary = self.client.get('/api/challenges_summary/').json()
+        self.assertEqual(summary[0]['athletes'][0]['full_name'], 'Ivan Sidorov')
+
+
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        started = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        cls.coaches = User.objects.bulk_create([
+            User(username=f'coach_{index}', is_staff=True) for index in range(5)
+        ])
+        cls.athletes = User.objects.bulk_create([
+            User(username=f'athlete_{index}') for index in range(50)
+        ])
+        cls.runs = Run.objects.bulk_create([
+            Run(athlete=athlete, comment='run', status=status, distance=index, speed=index)
+            for index, athlete in enumerate(cls.athletes)
+            for status in ('init', 'in_progress', 'finished', 'finished')
+        ])
+        Position.objects.bulk_create([
+            Position(run=run, latitude=55, longitude=37, date_time=started + timedelta(seconds=index))
+            for run in cls.runs for index in range(20)
+        ])
+        PendingPosition.objects.bulk_create([
+            PendingPosition(run=run, latitude=55, longitude=37, date_time=started + timedelta(seconds=index))
+            for run in cls.runs[:20] for index in range(20)
+        ])
+        Challenge.objects.bulk_create([
+            Challenge(athlete=athlete, full_name=f'Challenge {index}')
+            for athlete in cls.athletes for index in range(3)
+        ])
+        Subscribe.objects.bulk_create([
+            Subscribe(athlete=athlete, coach=cls.coaches[index % len(cls.coaches)])
+            for index, athlete in enumerate(cls.athletes)
+        ])
+        CoachRating.objects.bulk_create([
+            CoachRating(athlete=athlete, coach=cls.coaches[index % len(cls.coaches)], rating=index % 5 + 1)
+            for index, athlete in enumerate(cls.athletes)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        cache.clear()
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}')
+            return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+
+    @contextmanager
+    def assertUsesIndexes(self, *models, sorts=False):
+        with CaptureQueriesContext(connection) as context:
+            yield
+        tables = [f'"{model._meta.db_table}"' for model in models]
+        statements = [query['sql'] for query in context.captured_queries
+                      if query['sql'].startswith('SELECT') and any(table in query['sql'] for table in tables)]
+        self.assertTrue(statements, f'No queries against {", ".join(tables)}')
+        for sql in statements:
+            plan = self.explain(sql)
+            if connection.vendor == 'sqlite':
+                for line in plan.splitlines():
+                    self.assertFalse(' SCAN ' in f' {line} ' and ' USING ' not in line, f'Sequential scan:\n{sql}\n{plan}')
+                    if not sorts:
+                        self.assertNotIn('USE TEMP B-TREE', line, f'Filesort:\n{sql}\n{plan}')
+            elif connection.vendor == 'postgresql':
+                self.assertNotIn('Seq Scan', plan, f'Sequential scan:\n{sql}\n{plan}')
+                if not sorts:
+                    self.assertNotIn('Sort', plan.replace('Sort Key', ''), f'Filesort:\n{sql}\n{plan}')
+
+    def test_run_state_fallback(self):
+        run = self.runs[1]
+        with self.assertUsesIndexes(Position):
+            response = self.client.post('/api/positions/', {
+                'run': run.id, 'latitude': 55, 'longitude': 37, 'date_time': '2024-01-02T00:00:00.000000'
+            })
+        self.assertEqual(response.status_code, 201)
+
+    def test_positions_keyset_page(self):
+        run = self.runs[1]
+        page = self.client.get('/api/positions/', {'run': run.id, 'size': 5}).json()
+        with self.assertUsesIndexes(Position):
+            self.client.get(page['next'])
+
+    def test_runs_keyset_page(self):
+        page = self.client.get('/api/runs/', {'size': 20}).json()
+        with self.assertUsesIndexes(Run):
+            self.client.get(page['next'])
+        with self.assertUsesIndexes(Run):
+            self.client.get('/api/runs/', {'status': 'finished', 'ordering': '-created_at', 'size': 20})
+
+    def test_runs_by_athlete_and_status(self):
+        with self.assertUsesIndexes(Run):
+            rebuild_athlete_stats([self.athletes[0].id])
+
+    def test_coach_analytics_range(self):
+        with self.assertUsesIndexes(Run, Subscribe):
+            self.client.get(f'/api/analytics_for_coach/{self.coaches[0].id}/', {'from': '2024-01-01', 'to': '2024-02-01'})
+
+    def test_challenges_by_athlete(self):
+        with self.assertUsesIndexes(Challenge):
+            self.client.get('/api/challenges/', {'athlete': self.athletes[0].id})
+
+    def test_challenges_summary(self):
+        with self.assertUsesIndexes(Challenge):
+            self.client.get('/api/challenges_summary/')
+
+    def test_ratings_by_coach(self):
+        with self.assertUsesIndexes(CoachRating):
+            self.client.post(f'/api/rate_coach/{self.coaches[0].id}/', {'athlete': self.athletes[0].id, 'rating': 5})
+
+    def test_coach_rollups_range(self):
+        with self.assertUsesIndexes(AthleteDailyRollup, Subscribe, sorts=True):
+            self.client.get(f'/api/coach_rollups/{self.coaches[0].id}/', {
+                'period': 'month', 'from': '2024-01-01', 'to': '2024-02-01'
+            })
+
+    def test_pending_positions_flush(self):
+        with self.assertUsesIndexes(PendingPosition):
+            flush_pending_positions(self.runs[0].id, limit=100)
+
+
+class ApiBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        started = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        coaches = User.objects.bulk_create([
+            User(username=f'coach_{index}', first_name='Coach', last_name=str(index), is_staff=True)
+            for index in range(20)
+        ])
+        athletes = User.objects.bulk_create([
+            User(username=f'athlete_{index}', first_name='Athlete', last_name=str(index)) for index in range(200)
+        ])
+        runs = Run.objects.bulk_create([
+            Run(athlete=athlete, comment='run', status='finished', distance=index % 20, speed=3,
+                run_time_seconds=1200)
+            for athlete in athletes for index in range(3)
+        ])
+        run_in_progress = Run.objects.create(athlete=athletes[0], comment='run', status='in_progress')
+        run_init = Run.objects.create(athlete=athletes[0], comment='run')
+        Position.objects.bulk_create([
+            Position(run=run, latitude=55 + index / 10000, longitude=37 + index / 10000,
+                     date_time=started + timedelta(seconds=index), speed=3, distance=index / 300)
+            for run in (runs[0], run_in_progress) for index in range(500)
+        ])
+        items = CollectibleItem.objects.bulk_create([
+            CollectibleItem(name=f'item_{index}', uid=f'{index:06d}', latitude=55 + index / 1000,
+                            longitude=37 + index / 1000, picture='https://example.com/item.png', value=index)
+            for index in range(300)
+        ])
+        for index, athlete in enumerate(athletes):
+            athlete.items.add(items[index % len(items)], items[(index + 1) % len(items)])
+        Challenge.objects.bulk_create([
+            Challenge(athlete=athlete, full_name=full_name)
+            for athlete in athletes[:100] for full_name in ('Сделай 10 Забегов!', 'Пробеги 50 километров!')
+        ])
+        Subscribe.objects.bulk_create([
+            Subscribe(athlete=athlete, coach=coaches[index % len(coaches)]) for index, athlete in enumerate(athletes[1:])
+        ])
+        CoachRating.objects.bulk_create([
+            CoachRating(athlete=athlete, coach=coaches[index % len(coaches)], rating=index % 5 + 1)
+            for index, athlete in enumerate(athletes[1:])
+        ])
+        rebuild_athlete_stats([user.id for user in coaches + athletes])
+        versions.bump(*(coach_analytics_resource(coach.id) for coach in coaches))
+        rebuild_daily_rollups([athlete.id for athlete in athletes])
+        cls.ids = {
+            'athlete': athletes[1].id,
+            'free_athlete': athletes[0].id,
+            'coach': coaches[0].id,
+            'run_init': run_init.id,
+            'run_in_progress': run_in_progress.id,
+            'run_finished': runs[0].id
+        }
+
+    def get_payload(self, payload):
+        if payload == 'workbook':
+            workbook = Workbook()
+            sheet = workbook.active
+            sheet.append(['Name', 'UID', 'Value', 'Latitude', 'Longitude', 'Picture'])
+            for index in range(100):
+                sheet.append([f'upload_{index}', f'u{index:05d}', index, 55.5, 37.5, 'https://example.com/item.png'])
+            content = BytesIO()
+            workbook.save(content)
+            return {'file': SimpleUploadedFile('items.xlsx', content.getvalue())}, None
+        if payload == 'fixes':
+            return [
+                {'latitude': 55.8, 'longitude': 37.7, 'date_time': f'2024-01-01T13:00:{index:02d}.000000'}
+                for index in range(50)
+            ], 'application/json'
+        if payload is None:
+            return None, None
+        return {key: value.format(**self.ids) if isinstance(value, str) else value
+                for key, value in payload.items()}, 'application/json'
+
+    def test_budgets(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(self.settings(MEDIA_ROOT=media_root.name))
+        for method, path, payload, max_queries, max_seconds in BUDGETS:
+            path = path.format(**self.ids)
+            with self.subTest(method=method.upper(), path=path):
+                cache.clear()
+                get_backend().clear()
+                data, content_type = self.get_payload(payload)
+                kwargs = {'content_type': content_type} if content_type else {}
+                with transaction.atomic():
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        response = getattr(self.client, method)(path, data, **kwargs)
+                        content = b''.join(response.streaming_content) if response.streaming else response.content
+                        elapsed = time.perf_counter() - started
+                    transaction.set_rollback(True)
+                self.assertLess(response.status_code, 300, content[:500])
+                self.assertLessEqual(len(queries), max_queries,
+                                     '\n'.join(query['sql'] for query in queries.captured_queries))
+                self.assertLessEqual(elapsed, max_seconds)
+
+
+class SeedLoadTests(TestCase):
+    def seed(self, prefix):
+        call_command('seed_load', prefix=prefix, athletes=6, coaches=2, runs=2, positions=30, items=20, workers=1,
+                     stdout=StringIO())
+        runs = Run.objects.filter(athlete__username__startswith=f'{prefix}_').order_by('id')
+        positions = Position.objects.filter(run__in=runs).order_by('run_id', 'date_time')
+        return runs, positions
+
+    def test_seed_is_deterministic(self):
+        first_runs, first_positions = self.seed('first')
+        second_runs, second_positions = self.seed('second')
+        fields = ('status', 'created_at', 'distance', 'positions_count')
+        self.assertTrue(first_positions.exists())
+        self.assertEqual(list(first_runs.values_list(*fields)), list(second_runs.values_list(*fields)))
+        self.assertEqual(list(first_positions.values_list('latitude', 'longitude', 'date_time')),
+                         list(second_positions.values_list('latitude', 'longitude', 'date_time')))
+
+    def test_run_totals_match_positions(self):
+        runs, positions = self.seed('totals')
+        self.assertEqual(runs.aggregate(total=Sum('positions_count'))['total'], positions.count())
+        for run in runs.filter(status='finished'):
+            self.assertAlmostEqual(run.distance, run.positions.order_by('-date_time').first().distance, places=2)
+
+
+class LoadTestTests(LiveServerTestCase):
+    def test_reports_every_endpoint(self):
+        call_command('seed_load', athletes=3, coaches=1, runs=3, positions=5, items=0, workers=1, stdout=StringIO())
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            call_command('loadtest', url=self.live_server_url, runners=1, positions=6, rate=100, coaches=1,
+                         poll_interval=0.05, output=output.name, stdout=StringIO())
+            results = json.load(output)
+        self.assertEqual(results['runs_completed'], 1)
+        self.assertEqual(set(results['endpoints']), {
+            'POST /api/runs/', 'POST /api/runs/{id}/start/', 'POST /api/positions/', 'POST /api/runs/{id}/stop/',
+            'GET /api/analytics_for_coach/{id}/', 'GET /api/users/?type=athlete&size=50'
+        })
+        self.assertEqual(results['endpoints']['POST /api/positions/']['requests'], 6)
+        for stats in results['endpoints'].values():
+            self.assertEqual(stats['errors'], 0)
+            self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+
+
+class CoachAnalyticsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.coach = User.objects.create(username='coach', is_staff=True)
+        cls.athletes = User.objects.bulk_create([User(username=f'athlete_{index}') for index in range(3)])
+        Subscribe.objects.bulk_create([Subscribe(athlete=athlete, coach=cls.coach) for athlete in cls.athletes])
+        runs = Run.objects.bulk_create([
+            Run(athlete=cls.athletes[0], comment='run', status='finished', distance=10, speed=2),
+            Run(athlete=cls.athletes[1], comment='run', status='finished', distance=6, speed=4),
+            Run(athlete=cls.athletes[1], comment='run', status='finished', distance=6, speed=4),
+            Run(athlete=cls.athletes[2], comment='run', status='in_progress', distance=50, speed=9),
+        ])
+        for run, created_at in zip(runs, ('2024-01-01', '2024-01-01', '2024-02-10', '2024-02-10')):
+            Run.objects.filter(id=run.id).update(created_at=datetime.fromisoformat(created_at).replace(tzinfo=timezone.utc))
+        rebuild_athlete_stats([athlete.id for athlete in cls.athletes])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_leaders(self):
+        response = self.client.get(f'/api/analytics_for_coach/{self.coach.id}/')
+        self.assertEqual(response.json(), {
+            'longest_run_user': self.athletes[0].id, 'longest_run_value': 10,
+            'total_run_user': self.athletes[1].id, 'total_run_value': 12,
+            'speed_avg_user': self.athletes[1].id, 'speed_avg_value': 4
+        })
+
+    def test_range(self):
+        response = self.client.get(f'/api/analytics_for_coach/{self.coach.id}/?from=2024-01-01&to=2024-01-31')
+        self.assertEqual(response.json()['total_run_user'], self.athletes[0].id)
+        response = self.client.get(f'/api/analytics_for_coach/{self.coach.id}/?from=2024-03-01')
+        self.assertEqual(response.json()['longest_run_user'], None)
+
+    def test_invalid_range(self):
+        for query in ('from=yesterday', 'from=2024-02-01&to=2024-01-01', 'to=2024-02-30'):
+            self.assertEqual(self.client.get(f'/api/analytics_for_coach/{self.coach.id}/?{query}').status_code, 400)
+
+    def test_cached_until_athlete_finishes_run(self):
+        get_coach_analytics(self.coach.id)
+        with self.assertNumQueries(1):
+            get_coach_analytics(self.coach.id)
+        run = Run.objects.create(athlete=self.athletes[2], comment='run', status='in_progress')
+        Position.objects.create(run=run, latitude=55, longitude=37, date_time=datetime(2024, 3, 1, tzinfo=timezone.utc))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/runs/{run.id}/stop/')
+        AthleteStats.objects.filter(athlete=self.athletes[2]).update(total_distance=100)
+        self.assertEqual(get_coach_analytics(self.coach.id)['total_run_user'], self.athletes[2].id)
+
+    def test_version_bumped_by_another_process(self):
+        get_coach_analytics(self.coach.id)
+        AthleteStats.objects.filter(athlete=self.athletes[2]).update(longest_run=100)
+        self.assertEqual(get_coach_analytics(self.coach.id)['longest_run_user'], self.athletes[0].id)
+        ResourceVersion.objects.create(name=coach_analytics_resource(self.coach.id), version=1)
+        self.assertEqual(get_coach_analytics(self.coach.id)['longest_run_user'], self.athletes[2].id)
+
+    def test_cleared_on_subscribe(self):
+        athlete = User.objects.create(username='fast')
+        AthleteStats.objects.create(athlete=athlete, avg_speed=20)
+        get_coach_analytics(self.coach.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            Subscribe.objects.create(athlete=athlete, coach=self.coach)
+        self.assertEqual(get_coach_analytics(self.coach.id)['speed_avg_user'], athlete.id)
+
+
+class LeaderboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.coach = User.objects.create(username='coach', is_staff=True)
+        cls.athletes = User.objects.bulk_create([User(username=f'athlete_{index}') for index in range(5)])
+        Subscribe.objects.bulk_create([Subscribe(athlete=athlete, coach=cls.coach) for athlete in cls.athletes[:3]])
+        AthleteStats.objects.bulk_create([
+            AthleteStats(athlete=athlete, runs_finished=index + 1, total_distance=10 * (index + 1), avg_speed=3)
+            for index, athlete in enumerate(cls.athletes[:4])
+        ])
+
+    def setUp(self):
+        get_backend().clear()
+
+    def test_local_backend(self):
+        backend = LocalBackend(timeout=60)
+        backend.replace('board', {1: 5, 2: 7, 3: 5})
+        self.assertEqual(backend.top('board', 2), [(2, 7), (1, 5)])
+        self.assertEqual(backend.rank('board', 3), (3, 5))
+        backend.update('board', 3, 8)
+        backend.update('board', 4, 1)
+        self.assertEqual(backend.top('board', 10), [(3, 8), (2, 7), (1, 5), (4, 1)])
+        self.assertEqual(backend.rank('board', 1), (3, 5))
+        self.assertIsNone(backend.rank('board', 5))
+        backend.update('missing', 1, 1)
+        self.assertFalse(backend.exists('missing'))
+
+    def test_global_and_coach_top(self):
+        response = self.client.get('/api/leaderboards/distance/?size=2')
+        self.assertEqual(response.json()['count'], 4)
+        self.assertEqual([row['athlete'] for row in response.json()['results']], [self.athletes[3].id, self.athletes[2].id])
+        response = self.client.get(f'/api/leaderboards/runs/?coach={self.coach.id}')
+        self.assertEqual([row['athlete'] for row in response.json()['results']], [athlete.id for athlete in self.athletes[2::-1]])
+
+    def test_rank(self):
+        response = self.client.get(f'/api/leaderboards/distance/?athlete={self.athletes[1].id}&coach={self.coach.id}')
+        self.assertEqual((response.json()['rank'], response.json()['value'], response.json()['count']), (2, 20, 3))
+        self.assertEqual(self.client.get(f'/api/leaderboards/distance/?athlete={self.athletes[4].id}').status_code, 404)
+        self.assertEqual(self.client.get('/api/leaderboards/height/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/leaderboards/distance/?coach={self.athletes[0].id}').status_code, 400)
+
+    def test_updated_at_run_stop(self):
+        self.client.get(f'/api/leaderboards/distance/?coach={self.coach.id}')
+        with self.assertNumQueries(2):
+            self.client.get(f'/api/leaderboards/distance/?coach={self.coach.id}')
+        run = Run.objects.create(athlete=self.athletes[0], comment='run', status='in_progress')
+        Position.objects.bulk_create([
+            Position(run=run, latitude=55, longitude=37, date_time=datetime(2024, 3, 1, tzinfo=timezone.utc),
+                     distance=0),
+            Position(run=run, latitude=55.5, longitude=37, date_time=datetime(2024, 3, 1, 3, tzinfo=timezone.utc),
+                     distance=55.6)
+        ])
+        Run.objects.filter(id=run.id).update(track_distance=55.6, positions_count=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/runs/{run.id}/stop/')
+        for query in ('', f'coach={self.coach.id}'):
+            response = self.client.get(f'/api/leaderboards/distance/?{query}')
+            self.assertEqual(response.json()['results'][0]['athlete'], self.athletes[0].id)
+            self.assertAlmostEqual(response.json()['results'][0]['value'], 65.6)
+
+    def test_coach_board_reloaded_on_subscribe(self):
+        self.client.get(f'/api/leaderboards/distance/?coach={self.coach.id}')
+        with self.captureOnCommitCallbacks(execute=True):
+            Subscribe.objects.create(athlete=self.athletes[3], coach=self.coach)
+        response = self.client.get(f'/api/leaderboards/distance/?coach={self.coach.id}')
+        self.assertEqual(response.json()['results'][0]['athlete'], self.athletes[3].id)
+
+
+class RollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.coach = User.objects.create(username='coach', is_staff=True)
+        cls.athletes = User.objects.bulk_create([User(username=f'athlete_{index}') for index in range(2)])
+        Subscribe.objects.bulk_create([Subscribe(athlete=athlete, coach=cls.coach) for athlete in cls.athletes])
+        runs = Run.objects.bulk_create([
+            Run(athlete=cls.athletes[0], comment='run', status='finished', distance=5, run_time_seconds=1800, speed=3),
+            Run(athlete=cls.athletes[0], comment='run', status='finished', distance=3, run_time_seconds=900, speed=4),
+            Run(athlete=cls.athletes[0], comment='run', status='finished', distance=10, run_time_seconds=3600, speed=2),
+            Run(athlete=cls.athletes[1], comment='run', status='finished', distance=7, run_time_seconds=2400, speed=3),
+            Run(athlete=cls.athletes[1], comment='run', status='in_progress', distance=None),
+        ])
+        days = ('2024-01-01T08:00', '2024-01-01T19:00', '2024-01-20T08:00', '2024-01-02T08:00', '2024-01-02T08:00')
+        for run, created_at in zip(runs, days):
+            Run.objects.filter(id=run.id).update(created_at=datetime.fromisoformat(created_at).replace(tzinfo=timezone.utc))
+        rebuild_daily_rollups([athlete.id for athlete in cls.athletes])
+
+    def test_backfill(self):
+        rollup = AthleteDailyRollup.objects.get(athlete=self.athletes[0], day='2024-01-01')
+        self.assertEqual((rollup.runs, rollup.distance, rollup.run_time_seconds, rollup.speed_sum), (2, 8, 2700, 7))
+        self.assertEqual(AthleteDailyRollup.objects.count(), 3)
+
+    def test_athlete_series(self):
+        response = self.client.get(f'/api/athlete_rollups/{self.athletes[0].id}/?period=day')
+        self.assertEqual([(row['period_start'], row['runs'], row['avg_speed']) for row in response.json()['series']],
+                         [('2024-01-01', 2, 3.5), ('2024-01-20', 1, 2)])
+        response = self.client.get(f'/api/athlete_rollups/{self.athletes[0].id}/?period=month')
+        self.assertEqual(response.json()['series'][0]['distance'], 18)
+
+    def test_coach_series(self):
+        response = self.client.get(f'/api/coach_rollups/{self.coach.id}/?period=week&from=2024-01-01&to=2024-01-07')
+        self.assertEqual(response.json()['series'], [{
+            'period_start': '2024-01-01', 'athletes': 2, 'runs': 3, 'distance': 15, 'run_time_seconds': 5100,
+            'avg_speed': 3.33
+        }])
+        self.assertEqual(self.client.get(f'/api/coach_rollups/{self.athletes[0].id}/').status_code, 400)
+        self.assertEqual(self.client.get(f'/api/athlete_rollups/{self.coach.id}/').status_code, 400)
+        self.assertEqual(self.client.get(f'/api/coach_rollups/{self.coach.id}/?period=year').status_code, 400)
+
+    def test_updated_at_run_stop(self):
+        for hour in (8, 9):
+            run = Run.objects.create(athlete=self.athletes[1], comment='run', status='in_progress')
+            Position.objects.create(run=run, latitude=55, longitude=37,
+                                    date_time=datetime(2024, 3, 1, hour, tzinfo=timezone.utc))
+            self.client.post(f'/api/runs/{run.id}/stop/')
+        fields = ('athlete', 'day', 'runs', 'distance', 'run_time_seconds', 'speed_sum')
+        incremental = list(AthleteDailyRollup.objects.order_by('athlete', 'day').values_list(*fields))
+        self.assertEqual(incremental[-1][2], 2)
+        rebuild_daily_rollups([athlete.id for athlete in self.athletes])
+        self.assertEqual(list(AthleteDailyRollup.objects.order_by('athlete', 'day').values_list(*fields)), incremental)
+
+
+@override_settings(COLLECTIBLE_ITEM_IMPORT_MODE='sync')
+class CollectibleItemImportTests(TestCase):
+    rows = [
+        ['Coin', 'c0001', 10, 55.75, 37.61, 'https://example.com/coin.png'],
+        ['Gem', 'g0001', '25', '59.93', '30.31', 'https://example.com/gem.png'],
+        ['Broken', 'b0001', 5, 95, 37.61, 'https://example.com/broken.png'],
+        ['No picture', 'n0001', 5, 55, 37, 'not a url'],
+        ['', 'e0001', 5, 55, 37, 'https://example.com/empty.png'],
+        ['Too long uid', 'x' * 11, 5, 55, 37, 'https://example.com/long.png'],
+        ['Fraction', 'f0001', 1.5, 55, 37, 'https://example.com/fraction.png'],
+    ]
+
+    def workbook(self):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['Name', 'UID', 'Value', 'Latitude', 'Longitude', 'Picture'])
+        for row in self.rows:
+            sheet.append(row)
+        content = BytesIO()
+        workbook.save(content)
+        return SimpleUploadedFile('items.xlsx', content.getvalue())
+
+    def csv(self):
+        lines = ['Name,UID,Value,Latitude,Longitude,Picture'] + [','.join(map(str, row)) for row in self.rows]
+        return SimpleUploadedFile('items.csv', '\n'.join(lines).encode(), content_type='text/csv')
+
+    def test_xlsx(self):
+        with self.settings(COLLECTIBLE_ITEM_IMPORT_BATCH_SIZE=1):
+            response = self.client.post('/api/upload_file/', {'file': self.workbook()})
+        self.assertEqual(response.json(), [
+            ['Broken', 'b0001', 5, 95, 37.61, 'https://example.com/broken.png'],
+            ['No picture', 'n0001', 5, 55, 37, 'not a url'],
+            [None, 'e0001', 5, 55, 37, 'https://example.com/empty.png'],
+            ['Too long uid', 'x' * 11, 5, 55, 37, 'https://example.com/long.png'],
+            ['Fraction', 'f0001', 1.5, 55, 37, 'https://example.com/fraction.png'],
+        ])
+        self.assertEqual(list(CollectibleItem.objects.order_by('uid').values_list('uid', 'value', 'latitude')),
+                         [('c0001', 10, 55.75), ('g0001', 25, 59.93)])
+
+    def test_csv(self):
+        response = self.client.post('/api/upload_file/', {'file': self.csv()})
+        self.assertEqual([row[1] for row in response.json()], ['b0001', 'n0001', 'e0001', 'x' * 11, 'f0001'])
+        self.assertEqual(CollectibleItem.objects.count(), 2)
+
+    def test_spatial_version_bumped(self):
+        version = get_version(RESOURCE_NAME)
+        self.client.post('/api/upload_file/', {'file': self.csv()})
+        self.assertEqual(get_version(RESOURCE_NAME), version + 1)
+
+
+class ImportJobTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(self.settings(MEDIA_ROOT=media_root.name))
+
+    def upload(self, uploaded_file):
+        response = self.client.post('/api/upload_file/', {'file': uploaded_file})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], 'pending')
+        return response.json()['id']
+
+    def process(self, batch_size=2):
+        call_command('process_import_jobs', once=True, batch_size=batch_size, stdout=StringIO(), stderr=StringIO())
+
+    def test_upload_is_processed_by_worker(self):
+        job_id = self.upload(CollectibleItemImportTests().csv())
+        path = ImportJob.objects.get(pk=job_id).file.path
+        self.assertFalse(CollectibleItem.objects.exists())
+        self.assertEqual(self.client.get(f'/api/import_jobs/{job_id}/').json()['rows_per_second'], None)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.process()
+        job = self.client.get(f'/api/import_jobs/{job_id}/').json()
+        self.assertEqual(job['status'], 'finished')
+        self.assertEqual((job['rows_processed'], job['items_created'], job['error_count']), (7, 2, 5))
+        self.assertEqual([row[1] for row in job['errors']], ['b0001', 'n0001', 'e0001', 'x' * 11, 'f0001'])
+        self.assertIsNotNone(job['rows_per_second'])
+        self.assertEqual(CollectibleItem.objects.count(), 2)
+        self.assertFalse(os.path.exists(path))
+
+    def test_broken_file_fails_job(self):
+        job_id = self.upload(SimpleUploadedFile('items.xlsx', b'not a workbook'))
+        self.process()
+        job = self.client.get(f'/api/import_jobs/{job_id}/').json()
+        self.assertEqual(job['status'], 'failed')
+        self.assertTrue(job['message'])
+
+    def test_jobs_are_claimed_once(self):
+        first = self.upload(CollectibleItemImportTests().csv())
+        second = self.upload(CollectibleItemImportTests().csv())
+        self.process()
+        self.assertEqual(set(ImportJob.objects.values_list('status', flat=True)), {'finished'})
+        self.assertEqual(CollectibleItem.objects.count(), 2)
+        self.assertEqual(ImportJob.objects.get(pk=first).items_created, 2)
+        self.assertEqual(len(ImportJob.objects.get(pk=second).errors), 7)
+
+    def test_upsert_job_reports_counts(self):
+        self.upload(CollectibleItemImportTests().csv())
+        self.process()
+        response = self.client.post('/api/upload_file/', {'file': CollectibleItemImportTests().csv(), 'mode': 'upsert'})
+        self.process()
+        job = self.client.get(f'/api/import_jobs/{response.json()["id"]}/').json()
+        self.assertEqual((job['mode'], job['items_created'], job['items_updated'], job['items_unchanged']),
+                         ('upsert', 0, 0, 2))
+
+    def test_unknown_mode(self):
+        response = self.client.post('/api/upload_file/', {'file': CollectibleItemImportTests().csv(), 'mode': 'merge'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ImportJob.objects.exists())
+
+    def test_unknown_job(self):
+        self.assertEqual(self.client.get('/api/import_jobs/1/').status_code, 404)
+
+
+@override_settings(COLLECTIBLE_ITEM_IMPORT_MODE='sync')
+class CollectibleItemUpsertTests(TestCase):
+    header = 'Name,UID,Value,Latitude,Longitude,Picture'
+
+    def upload(self, *lines, mode='upsert'):
+        content = '\n'.join([self.header, *lines]).encode()
+        return self.client.post('/api/upload_file/', {
+            'file': SimpleUploadedFile('items.csv', content, content_type='text/csv'), 'mode': mode
+        }).json()
+
+    def test_reimport_updates_by_uid(self):
+        self.upload('Coin,c1,10,55.75,37.61,https://example.com/coin.png',
+                    'Gem,g1,25,59.93,30.31,https://example.com/gem.png')
+        item = CollectibleItem.objects.get(uid='c1')
+        item.athletes.add(User.objects.create_user(username='collector'))
+
+        result = self.upload('Gold coin,c1,15,55.75,37.61,https://example.com/coin.png',
+                             'Gem,g1,25,59.93,30.31,https://example.com/gem.png',
+                             'Ring,r1,40,55.0,37.0,https://example.com/ring.png',
+                             'Broken,b1,5,95,37,https://example.com/broken.png')
+        self.assertEqual(result, {
+            'created': 1, 'updated': 1, 'unchanged': 1,
+            'errors': [['Broken', 'b1', '5', '95', '37', 'https://example.com/broken.png']]
+        })
+        self.assertEqual(CollectibleItem.objects.count(), 3)
+        item = CollectibleItem.objects.get(uid='c1')
+        self.assertEqual((item.name, item.value, item.athletes.count()), ('Gold coin', 15, 1))
+
+    def test_repeated_uid_in_one_file(self):
+        result = self.upload('Coin,c1,10,55.75,37.61,https://example.com/coin.png',
+                             'Coin,c1,12,55.75,37.61,https://example.com/coin.png',
+                             'Coin,c1,12,55.75,37.61,https://example.com/coin.png')
+        self.assertEqual((result['created'], result['updated'], result['unchanged']), (1, 1, 1))
+        self.assertEqual(list(CollectibleItem.objects.values_list('uid', 'value')), [('c1', 12)])
+
+    def test_insert_mode_rejects_existing_uid(self):
+        self.upload('Coin,c1,10,55.75,37.61,https://example.com/coin.png', mode='insert')
+        errors = self.upload('Coin,c1,12,55.75,37.61,https://example.com/coin.png',
+                             'Gem,g1,25,59.93,30.31,https://example.com/gem.png', mode='insert')
+        self.assertEqual([row[1] for row in errors], ['c1'])
+        self.assertEqual(CollectibleItem.objects.get(uid='c1').value, 10)
+        self.assertTrue(CollectibleItem.objects.filter(uid='g1').exists())
+
+    def test_upsert_queries_per_batch(self):
+        lines = [f'Item {index},i{index},{index},55.0,37.0,https://example.com/{index}.png' for index in range(10)]
+        with self.settings(COLLECTIBLE_ITEM_IMPORT_BATCH_SIZE=5):
+            self.upload(*lines)
+            with CaptureQueriesContext(connection) as queries:
+                result = self.upload(*lines[:5], *[line.replace('55.0', '56.0') for line in lines[5:]])
+        self.assertEqual((result['created'], result['updated'], result['unchanged']), (0, 5, 5))
+        self.assertLessEqual(len(queries), 8)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.athlete = User.objects.create_user(username='athlete', first_name='Ann', last_name='Smith')
+        self.coach = User.objects.create_user(username='coach', is_staff=True)
+        self.item = CollectibleItem.objects.create(name='Coin', uid='c1', latitude=55.75, longitude=37.61,
+                                                   picture='https://example.com/coin.png', value=10)
+
+    def assertNotModified(self, path, queries=1):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('ETag'))
+        with self.assertNumQueries(queries):
+            cached = self.client.get(path, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(cached.status_code, 304)
+        return response['ETag']
+
+    def assertModified(self, path, etag):
+        response = self.client.get(path, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_company_details(self):
+        etag = self.assertNotModified('/api/company_details/', queries=0)
+        with self.settings(SLOGAN='Faster'):
+            self.assertModified('/api/company_details/', etag)
+
+    def test_collectible_items(self):
+        etag = self.assertNotModified('/api/collectible_item/')
+        self.assertTrue(self.client.get('/api/collectible_item/').has_header('Last-Modified'))
+        self.item.athletes.add(self.athlete)
+        self.assertModified('/api/collectible_item/', etag)
+        etag = self.assertNotModified(f'/api/collectible_item/{self.item.id}/')
+        self.item.delete()
+        self.assertEqual(self.client.get(f'/api/collectible_item/{self.item.id}/',
+                                         headers={'If-None-Match': etag}).status_code, 404)
+
+    def test_challenges_summary(self):
+        etag = self.assertNotModified('/api/challenges_summary/')
+        Challenge.objects.create(athlete=self.athlete, full_name='Сделай 10 Забегов!')
+        self.assertModified('/api/challenges_summary/', etag)
+
+    def test_user_detail(self):
+        path = f'/api/users/{self.athlete.id}/'
+        coach_path = f'/api/users/{self.coach.id}/'
+        etag, coach_etag = self.assertNotModified(path), self.assertNotModified(coach_path)
+        self.client.post(f'/api/subscribe_to_coach/{self.coach.id}/', {'athlete': self.athlete.id})
+        self.assertModified(path, etag)
+        self.assertModified(coach_path, coach_etag)
+
+        coach_etag = self.assertNotModified(coach_path)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/rate_coach/{self.coach.id}/', {'athlete': self.athlete.id, 'rating': 5})
+        self.assertModified(coach_path, coach_etag)
+
+        etag = self.assertNotModified(path)
+        run = Run.objects.create(athlete=self.athlete, status='in_progress')
+        self.client.post(f'/api/runs/{run.id}/stop/')
+        self.assertModified(path, etag)
+
+        other_etag = self.assertNotModified(coach_path)
+        self.athlete.first_name = 'Anna'
+        self.athlete.save()
+        self.assertEqual(self.client.get(coach_path, headers={'If-None-Match': other_etag}).status_code, 304)
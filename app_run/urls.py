@@ -13,11 +13,19 @@ router.register('collectible_item', views.CollectibleItemViewSet, basename='coll
 urlpatterns = [
     path('company_details/', views.company_details_view),
     path('upload_file/', views.upload_file),
+    path('import_jobs/<int:job_id>/', views.ImportJobView.as_view()),
     path('runs/<int:run_id>/start/', views.RunStartView.as_view()),
     path('runs/<int:run_id>/stop/', views.RunStopView.as_view()),
+    path('runs/<int:run_id>/positions/batch/', views.RunPositionsBatchView.as_view()),
+    path('runs/<int:run_id>/track.gpx', views.RunTrackExportView.as_view(export_format='gpx')),
+    path('runs/<int:run_id>/track.ndjson', views.RunTrackExportView.as_view(export_format='ndjson')),
+    path('positions/queue/', views.PositionQueueView.as_view()),
     path('subscribe_to_coach/<int:id>/', views.SubscribeToCoachView.as_view()),
     path('challenges_summary/', views.ChallengesSummaryView.as_view()),
     path('rate_coach/<int:coach_id>/', views.CoachRatingsView.as_view()),
     path('analytics_for_coach/<int:coach_id>/', views.AnalyticsForCoachView.as_view()),
+    path('leaderboards/<str:metric>/', views.LeaderboardView.as_view()),
+    path('athlete_rollups/<int:user_id>/', views.RollupSeriesView.as_view(scope='athlete')),
+    path('coach_rollups/<int:user_id>/', views.RollupSeriesView.as_view(scope='coach')),
     path('', include(router.urls))
 ]
\ No newline at end of file
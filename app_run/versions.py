@@ -0,0 +1,42 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from app_run.models import ResourceVersion
+
+COLLECTIBLE_ITEMS = 'collectible_items'
+CHALLENGES = 'challenges'
+
+
+def user_resource(user_id):
+    return f'user:{user_id}'
+
+
+def bump(*names):
+    names = set(names)
+    if not names:
+        return
+    now = timezone.now()
+    if ResourceVersion.objects.filter(name__in=names).update(version=F('version') + 1, updated_at=now) == len(names):
+        return
+    existing = set(ResourceVersion.objects.filter(name__in=names).values_list('name', flat=True))
+    for name in names - existing:
+        try:
+            with transaction.atomic():
+                ResourceVersion.objects.create(name=name, version=1)
+        except IntegrityError:
+            ResourceVersion.objects.filter(name=name).update(version=F('version') + 1, updated_at=now)
+
+
+def get_version(name):
+    return ResourceVersion.objects.filter(name=name).values_list('version', flat=True).first() or 0
+
+
+def get_state(*names):
+    rows = {
+        name: (version, updated_at) for name, version, updated_at in
+        ResourceVersion.objects.filter(name__in=names).values_list('name', 'version', 'updated_at')
+    }
+    etag = '-'.join(str(rows[name][0]) if name in rows else '0' for name in names)
+    last_modified = max((updated_at for _, updated_at in rows.values()), default=None)
+    return etag, last_modified
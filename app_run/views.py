@@ -1,63 +1,144 @@
+import hashlib
+import json
+import math
+from datetime import datetime, time, timedelta
+from xml.sax.saxutils import escape
+
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.db.models import Avg, Count, Max, Min, Q, Sum
+from django.db import transaction
+from django.db.models import Count, F, Min, Prefetch
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from django_filters.rest_framework import DjangoFilterBackend
-from geopy.distance import distance
-from openpyxl import load_workbook
 from rest_framework import mixins, viewsets
 from rest_framework.decorators import api_view
+from rest_framework.exceptions import ValidationError
 from rest_framework.filters import OrderingFilter, SearchFilter
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
 
+from app_run import geo, versions
+from app_run.analytics import (clear_athlete_coaches_analytics,
+                               get_coach_analytics)
+from app_run.archive import iter_track, simplified_track, track_positions
+from app_run.challenges import (award_challenges, get_challenges_summary,
+                                get_metrics)
+from app_run.imports import IMPORT_MODES, import_items
+from app_run.ingest import (FixOrderError, clear_run_state, collect_items,
+                            finalize_run_totals, flush_pending_positions,
+                            get_run_state, lock_run, rebuild_run_track,
+                            record_positions, save_run_state,
+                            update_run_totals)
+from app_run.leaderboards import (METRICS, get_rank, get_top,
+                                  update_leaderboards)
 from app_run.models import (AthleteInfo, Challenge, CoachRating,
-                            CollectibleItem, Position, Run, Subscribe)
+                            CollectibleItem, ImportJob, PendingPosition,
+                            Position, PositionFlush, Run, RunTrack,
+                            Subscribe)
+from app_run.pagination import (PositionKeysetPagination,
+                                ProgressRunItemPagination, RunKeysetPagination)
+from app_run.rollups import PERIODS, get_series, record_daily_rollup
 from app_run.serializers import (AthleteDetailSerializer,
                                  AthleteInfoSerializer, ChallengeSerializer,
                                  CoachDetailSerializer, CoachRatingSerilizer,
-                                 CollectibleItemSerializer, PositionSerializer,
+                                 CollectibleItemSerializer, ImportJobSerializer,
+                                 PositionBatchSerializer, PositionSerializer,
                                  RunSerializer, UserSerializer)
+from app_run.stats import record_finished_run
+
+
+def get_analytics_range(request):
+    bounds = []
+    for param in ('from', 'to'):
+        value = request.query_params.get(param)
+        if not value:
+            bounds.append(None)
+            continue
+        try:
+            day = parse_date(value) if len(value) == 10 else None
+            if day is not None:
+                moment = datetime.combine(day + timedelta(days=1) if param == 'to' else day, time.min)
+            else:
+                moment = parse_datetime(value)
+        except ValueError:
+            moment = None
+        if moment is None:
+            raise ValidationError({param: 'Has to be a date (YYYY-MM-DD) or an ISO 8601 datetime.'})
+        bounds.append(timezone.make_aware(moment) if timezone.is_naive(moment) else moment)
+    if None not in bounds and bounds[0] >= bounds[1]:
+        raise ValidationError({'to': 'Has to be later than from.'})
+    return bounds
+
+
+def get_positive_int(request, name):
+    value = request.query_params.get(name, '')
+    return int(value) if value.isdigit() and int(value) > 0 else None
+
+
+def get_simplify_tolerance(request):
+    value = request.query_params.get('simplify')
+    if value is None:
+        return None
+    try:
+        tolerance = float(value)
+    except ValueError:
+        tolerance = 0
+    if not 0 < tolerance < math.inf:
+        raise ValidationError({'simplify': 'Tolerance has to be a positive number of meters.'})
+    levels = settings.SIMPLIFY_TOLERANCES
+    return next((level for level in levels if level >= tolerance), levels[-1])
+
+
+def versioned(get_names):
+    def get_state(request, *args, **kwargs):
+        if not hasattr(request, 'resource_state'):
+            request.resource_state = versions.get_state(*get_names(request, *args, **kwargs))
+        return request.resource_state
+
+    return method_decorator(condition(
+        etag_func=lambda request, *args, **kwargs: get_state(request, *args, **kwargs)[0],
+        last_modified_func=lambda request, *args, **kwargs: get_state(request, *args, **kwargs)[1]
+    ))
+
+
+def get_company_details():
+    return {
+        'company_name': settings.COMPANY_NAME,
+        'slogan': settings.SLOGAN,
+        'contacts': settings.CONTACTS
+    }
 
 
-class ProgressRunItemPagination(PageNumberPagination):
-    page_size_query_param = 'size'
+def get_company_details_etag(request):
+    return hashlib.md5(json.dumps(get_company_details(), sort_keys=True).encode()).hexdigest()
 
 
 @api_view(['POST'])
 def upload_file(request):
     uploaded_file = request.FILES.get('file')
-    if uploaded_file:
-        wb = load_workbook(uploaded_file)
-        ws = wb.active
-        errors = []
-        for row in ws.iter_rows(min_row=2, values_only=True):
-            name, uid, value, latitude, longitude, url = row
-            serializer = CollectibleItemSerializer(data={
-                'name': name,
-                'uid': uid,
-                'value': value,
-                'latitude': latitude,
-                'longitude': longitude,
-                'picture': url
-            })
-            if serializer.is_valid():
-                CollectibleItem.objects.create(**serializer.validated_data)
-            else:
-                errors.append(row)
-        return Response(errors)
-    return Response("File is not available!", status=400)
+    if not uploaded_file:
+        return Response("File is not available!", status=400)
+    mode = request.data.get('mode', 'insert')
+    if mode not in IMPORT_MODES:
+        return Response(f"Import mode has to be one of: {', '.join(IMPORT_MODES)}.", status=400)
+    if settings.COLLECTIBLE_ITEM_IMPORT_MODE != 'async':
+        counts, errors = import_items(uploaded_file, mode)
+        return Response(errors if mode == 'insert' else {**counts, 'errors': errors})
+    job = ImportJob.objects.create(file=uploaded_file, file_name=uploaded_file.name, mode=mode)
+    return Response({'id': job.id, 'status': job.status}, status=202)
 
 
 @api_view(['GET'])
+@condition(etag_func=get_company_details_etag)
 def company_details_view(request):
-    details = {
-        'company_name': settings.COMPANY_NAME,
-        'slogan': settings.SLOGAN,
-        'contacts': settings.CONTACTS
-    }
-    return Response(details)
+    return Response(get_company_details())
 
 
 class RunViewSet(viewsets.ModelViewSet):
@@ -66,13 +147,28 @@ class RunViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_fields = ['status', 'athlete']
     ordering_fields = ['created_at']
-    pagination_class = ProgressRunItemPagination
+    pagination_class = RunKeysetPagination
+
+    def retrieve(self, request, *args, **kwargs):
+        tolerance = get_simplify_tolerance(request)
+        if tolerance is None:
+            return super().retrieve(request, *args, **kwargs)
+        run = self.get_object()
+        data = self.get_serializer(run).data
+        data['track'] = [[float(latitude), float(longitude)]
+                         for _, latitude, longitude, *_ in simplified_track(run, tolerance)]
+        return Response(data)
+
+    def destroy(self, request, *args, **kwargs):
+        if self.get_object().status == 'finished':
+            return Response({ 'message': 'Incorrect Status' }, status=400)
+        return super().destroy(request, *args, **kwargs)
 
 
 class UsersViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = User.objects.annotate(
-        runs_finished=Count('runs', filter=Q(runs__status='finished')),
-        rating=Avg('ratings_to_coach__rating')
+        runs_finished=Coalesce('stats__runs_finished', 0),
+        rating=F('stats__rating_avg')
     )
     serializer_class = UserSerializer
     filter_backends = [SearchFilter, OrderingFilter]
@@ -83,16 +179,21 @@ class UsersViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         type = self.request.query_params.get('type', '')
         qs = self.queryset.filter(is_superuser=False)
+        if self.action == 'retrieve':
+            qs = qs.prefetch_related(Prefetch('items', queryset=CollectibleItem.objects.prefetch_related(
+                Prefetch('athletes', queryset=User.objects.only('id'))
+            )))
         if type == 'coach':
             return qs.filter(is_staff=True)
         elif type == 'athlete':
             return qs.filter(is_staff=False)
         return qs
 
-    def get_serializer_class(self):
-        if self.action == 'retrieve':
-            return CoachDetailSerializer if self.get_object().is_staff else AthleteDetailSerializer
-        return super().get_serializer_class()
+    @versioned(lambda request, pk, **kwargs: [versions.user_resource(pk), versions.COLLECTIBLE_ITEMS])
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        serializer_class = CoachDetailSerializer if instance.is_staff else AthleteDetailSerializer
+        return Response(serializer_class(instance, context=self.get_serializer_context()).data)
 
 
 class AthleteInfoViewSet(mixins.RetrieveModelMixin,
@@ -136,35 +237,87 @@ class PositionViewSet(viewsets.ModelViewSet):
     serializer_class = PositionSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['run']
-
+    pagination_class = PositionKeysetPagination
+
+    def list(self, request, *args, **kwargs):
+        run_id = request.query_params.get('run', '')
+        tolerance = get_simplify_tolerance(request)
+        if tolerance is not None:
+            if not run_id.isdigit():
+                raise ValidationError({'run': 'Run filter is required to simplify the track.'})
+            run = get_object_or_404(Run, id=run_id)
+            return self.list_positions(track_positions(run.id, simplified_track(run, tolerance)))
+        if run_id.isdigit() and RunTrack.objects.filter(run_id=run_id).exists():
+            return self.list_positions(track_positions(int(run_id), iter_track(run_id)))
+        return super().list(request, *args, **kwargs)
+
+    def list_positions(self, positions):
+        page = self.paginate_queryset(positions)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(positions, many=True).data)
+
+    def create(self, request, *args, **kwargs):
+        if settings.POSITION_INGEST_MODE != 'buffered':
+            return super().create(request, *args, **kwargs)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        PendingPosition.objects.create(**serializer.validated_data)
+        return Response(serializer.data, status=202)
+
+    @transaction.atomic
     def perform_create(self, serializer):
-        run = serializer.validated_data.get('run')
+        run = lock_run(serializer.validated_data.get('run').id)
         athlete_latitude = serializer.validated_data.get('latitude')
         athlete_longitude = serializer.validated_data.get('longitude')
-        items = CollectibleItem.objects.all()
-        for item in items:
-            distance_to_item = round(
-                distance((item.latitude, item.longitude), (athlete_latitude, athlete_longitude)).m,
-                3
-            )
-            if distance_to_item <= 100 and not item in run.athlete.items.all():
-                run.athlete.items.add(item)
-        previous_position = run.positions.all().order_by('-date_time').first()
+        collect_items(run.athlete, [serializer.validated_data])
+        previous_position = get_run_state(run)
+        distance_to_previous_position = 0
         if previous_position:
-            distance_to_previous_position = round(distance((previous_position.latitude, previous_position.longitude),
-                                                           (athlete_latitude, athlete_longitude)).m, 2)
+            distance_to_previous_position = round(geo.distance((previous_position['latitude'], previous_position['longitude']),
+                                                               (athlete_latitude, athlete_longitude)), 2)
             time_from_previous_position = (
-                serializer.validated_data.get('date_time') - previous_position.date_time
+                serializer.validated_data.get('date_time') - previous_position['date_time']
             ).total_seconds()
             serializer.validated_data['speed'] = round(distance_to_previous_position / time_from_previous_position, 2)
-            serializer.validated_data['distance'] = previous_position.distance + (distance_to_previous_position / 1000)
+            serializer.validated_data['distance'] = previous_position['distance'] + (distance_to_previous_position / 1000)
+        position = serializer.save()
+        update_run_totals(run, [position], distance_to_previous_position / 1000)
+        save_run_state(run, position, previous_position)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        run_ids = {serializer.instance.run_id, serializer.validated_data.get('run', serializer.instance.run).id}
+        runs = self.lock_runs(run_ids)
         serializer.save()
+        for run in runs:
+            rebuild_run_track(run)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        run, = self.lock_runs([instance.run_id])
+        instance.delete()
+        rebuild_run_track(run)
+
+    def lock_runs(self, run_ids):
+        runs = [lock_run(run_id) for run_id in sorted(run_ids)]
+        if any(run.status != 'in_progress' for run in runs):
+            raise ValidationError({'run': "Run status has to be 'in_progress'."})
+        return runs
 
 
 class CollectibleItemViewSet(viewsets.ModelViewSet):
-    queryset = CollectibleItem.objects.all()
+    queryset = CollectibleItem.objects.prefetch_related(Prefetch('athletes', queryset=User.objects.only('id')))
     serializer_class = CollectibleItemSerializer
 
+    @versioned(lambda request, **kwargs: [versions.COLLECTIBLE_ITEMS])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @versioned(lambda request, pk, **kwargs: [versions.COLLECTIBLE_ITEMS])
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
 
 class RunStartView(APIView):
     def post(self, request, run_id):
@@ -178,32 +331,93 @@ class RunStartView(APIView):
 
 class RunStopView(APIView):
     def post(self, request, run_id):
-        run = get_object_or_404(Run, id=run_id)
+        with transaction.atomic():
+            run = get_object_or_404(Run.objects.select_for_update(), id=run_id)
+            if run.status != 'in_progress':
+                return Response({'message': 'Incorrect Status'}, status=400)
+            if run.pending_positions.exists():
+                flush_pending_positions(run.id)
+                run.refresh_from_db()
+            finalize_run_totals(run)
+            run.status = 'finished'
+            run.save(update_fields=['distance', 'run_time_seconds', 'speed', 'status'])
+            stats = record_finished_run(run)
+            award_challenges(run.athlete_id, get_metrics(stats, run))
+            clear_athlete_coaches_analytics(run.athlete_id)
+            update_leaderboards(stats)
+            record_daily_rollup(run)
+        clear_run_state(run)
+        return Response(RunSerializer(run).data)
+
+
+class RunPositionsBatchView(APIView):
+    def post(self, request, run_id):
+        run = get_object_or_404(Run.objects.select_related('athlete'), id=run_id)
         if run.status != 'in_progress':
             return Response({'message': 'Incorrect Status'}, status=400)
-        run.distance = round(distance(*[(position.latitude, position.longitude)
-                                        for position in run.positions.all()])
-                                        .km, 3)
-        timestampts = run.positions.aggregate(start=Min('date_time'), stop=Max('date_time'))
-        start, stop = timestampts.get('start'), timestampts.get('stop')
-        run.run_time_seconds = (stop - start).total_seconds() if start and stop else 0
-        speed = run.positions.aggregate(Avg('speed')).get('speed__avg')
-        run.speed = speed if speed else 0
-        run.status = 'finished'
-        run.save()
-        athlete = run.athlete
-        finished_runs = athlete.runs.filter(status='finished')
-        if (finished_runs.count() >= 10
-            and not Challenge.objects.filter(athlete=athlete, full_name='Сделай 10 Забегов!').exists()):
-            Challenge.objects.create(full_name='Сделай 10 Забегов!', athlete=athlete)
-        total_distance = finished_runs.aggregate(Sum('distance'))
-        if (total_distance.get('distance__sum') >= 50
-            and not Challenge.objects.filter(athlete=athlete, full_name='Пробеги 50 километров!').exists()):
-            Challenge.objects.create(full_name='Пробеги 50 километров!', athlete=athlete)
-        if (run.distance >= 2 and run.run_time_seconds <= 600
-            and not Challenge.objects.filter(athlete=athlete, full_name='2 километра за 10 минут!').exists()):
-            Challenge.objects.create(full_name='2 километра за 10 минут!', athlete=athlete)
-        return Response(RunSerializer(run).data)
+        serializer = PositionBatchSerializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        try:
+            positions = record_positions(run, serializer.validated_data)
+        except FixOrderError as error:
+            return Response(error.errors, status=400)
+        return Response(PositionSerializer(positions, many=True).data, status=201)
+
+
+class RunTrackExportView(APIView):
+    export_format = 'ndjson'
+    chunk_size = 2000
+    content_types = {
+        'gpx': 'application/gpx+xml',
+        'ndjson': 'application/x-ndjson'
+    }
+
+    def get(self, request, run_id):
+        run = get_object_or_404(Run, id=run_id)
+        rows = iter_track(run.id, chunk_size=self.chunk_size)
+        content = self.gpx(run, rows) if self.export_format == 'gpx' else self.ndjson(rows)
+        response = StreamingHttpResponse(content, content_type=self.content_types[self.export_format])
+        response['Content-Disposition'] = f'attachment; filename="run_{run.id}.{self.export_format}"'
+        return response
+
+    def gpx(self, run, rows):
+        yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+               '<gpx version="1.1" creator="project_run" xmlns="http://www.topografix.com/GPX/1/1">\n'
+               f'<trk><name>{escape(run.comment or f"Run {run.id}")}</name><trkseg>\n')
+        for _, latitude, longitude, date_time, _, _ in rows:
+            yield (f'<trkpt lat="{latitude}" lon="{longitude}">'
+                   f'<time>{date_time.strftime("%Y-%m-%dT%H:%M:%S.%fZ")}</time></trkpt>\n')
+        yield '</trkseg></trk></gpx>\n'
+
+    def ndjson(self, rows):
+        for position_id, latitude, longitude, date_time, speed, distance in rows:
+            yield json.dumps({
+                'id': position_id,
+                'latitude': float(latitude),
+                'longitude': float(longitude),
+                'date_time': date_time.strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+                'speed': speed,
+                'distance': distance
+            }) + '\n'
+
+
+class PositionQueueView(APIView):
+    def get(self, request):
+        pending = PendingPosition.objects.aggregate(
+            depth=Count('id'), runs=Count('run', distinct=True), oldest=Min('received_at')
+        )
+        oldest = pending.get('oldest')
+        return Response({
+            'mode': settings.POSITION_INGEST_MODE,
+            'depth': pending.get('depth'),
+            'runs': pending.get('runs'),
+            'oldest_received_at': oldest,
+            'lag_seconds': round((timezone.now() - oldest).total_seconds(), 3) if oldest else 0,
+            'last_flush': PositionFlush.objects.filter(id=1).values(
+                'flushed_at', 'positions', 'dropped', 'runs', 'duration_seconds', 'max_latency_seconds', 'depth'
+            ).first()
+        })
 
 
 class SubscribeToCoachView(APIView):
@@ -230,24 +444,29 @@ class SubscribeToCoachView(APIView):
 
 
 class ChallengesSummaryView(APIView):
+    @versioned(lambda request, **kwargs: [versions.CHALLENGES])
     def get(self, request):
-        challenges = Challenge.objects.all().select_related('athlete')
-        challenge_names = set([challenge.full_name for challenge in challenges])
-        challenge_names = [{ 'name_to_display': challenge_name, 'athletes': [] } for challenge_name in challenge_names]
-        for challenge_name in challenge_names:
-            for challenge in challenges:
-                if challenge_name['name_to_display'] != challenge.full_name:
-                    continue
-                full_name = ' '.join([challenge.athlete.first_name, challenge.athlete.last_name]) if (
-                    challenge.athlete.first_name and challenge.athlete.last_name
-                ) else ''
-                athlete = {
-                    'id': challenge.athlete.id,
-                    'full_name': full_name,
-                    'username': challenge.athlete.username
-                }
-                challenge_name['athletes'].append(athlete)
-        return Response(challenge_names)
+        summary = get_challenges_summary(request.resource_state)
+        full_name = request.query_params.get('full_name')
+        if full_name is not None:
+            summary = [group for group in summary if group['name_to_display'] == full_name]
+        size = get_positive_int(request, 'size')
+        if not size:
+            return Response(summary)
+        page = get_positive_int(request, 'page') or 1
+        return Response([self.paginate(request, group, size, page) for group in summary])
+
+    def paginate(self, request, group, size, page):
+        athletes = group['athletes']
+        start = (page - 1) * size
+        url = replace_query_param(request.build_absolute_uri(), 'full_name', group['name_to_display'])
+        return {
+            'name_to_display': group['name_to_display'],
+            'athletes_count': len(athletes),
+            'next': replace_query_param(url, 'page', page + 1) if start + size < len(athletes) else None,
+            'previous': replace_query_param(url, 'page', page - 1) if page > 1 else None,
+            'athletes': athletes[start:start + size]
+        }
 
 
 class CoachRatingsView(APIView):
@@ -293,22 +512,67 @@ class AnalyticsForCoachView(APIView):
         if not coach.is_staff:
             return Response({ 'message': f'User instance with ID: {coach_id} has invalid type.' })
 
-        athletes = User.objects.filter(subscribers__coach=coach).annotate(
-            longest_run=Max('runs__distance', filter=Q(runs__status='finished')),
-            total_run=Sum('runs__distance'),
-            speed_avg=Avg('runs__speed', filter=Q(runs__status='finished'))
-        )
+        start, end = get_analytics_range(request)
+        return Response(get_coach_analytics(coach.id, start, end))
 
-        longest_run_user = athletes.order_by('-longest_run', 'pk').first()
-        total_run_user = athletes.order_by('-total_run', 'pk').first()
-        speed_avg_user = athletes.order_by('-speed_avg', 'pk').first()
-
-        analytics = {
-            'longest_run_user': longest_run_user.id,
-            'longest_run_value': round(longest_run_user.longest_run, 2),
-            'total_run_user': total_run_user.id,
-            'total_run_value': round(total_run_user.total_run, 2),
-            'speed_avg_user': speed_avg_user.id,
-            'speed_avg_value': round(speed_avg_user.speed_avg, 2)
-        }
-        return Response(analytics)
\ No newline at end of file
+
+class LeaderboardView(APIView):
+    default_size = 10
+    max_size = 100
+
+    def get(self, request, metric):
+        if metric not in METRICS:
+            return Response({ 'message': f'Unknown leaderboard. Available: {", ".join(METRICS)}.' }, status=404)
+        coach_id = get_positive_int(request, 'coach')
+        if 'coach' in request.query_params and not User.objects.filter(
+                id=coach_id, is_staff=True, is_superuser=False).exists():
+            return Response({ 'message': 'Coach Instance doesn\'t exist.' }, status=400)
+
+        if 'athlete' in request.query_params:
+            athlete_id = get_positive_int(request, 'athlete')
+            position, count = get_rank(metric, athlete_id, coach_id)
+            if position is None:
+                return Response({ 'message': 'Athlete isn\'t ranked.' }, status=404)
+            rank, value = position
+            return Response({
+                'metric': metric, 'coach': coach_id, 'athlete': athlete_id, 'rank': rank, 'value': value, 'count': count
+            })
+
+        size = min(get_positive_int(request, 'size') or self.default_size, self.max_size)
+        top, count = get_top(metric, size, coach_id)
+        users = User.objects.only('id', 'username').in_bulk([member for member, _ in top])
+        return Response({
+            'metric': metric,
+            'coach': coach_id,
+            'count': count,
+            'results': [
+                {
+                    'rank': rank,
+                    'athlete': athlete_id,
+                    'username': users[athlete_id].username if athlete_id in users else None,
+                    'value': value
+                }
+                for rank, (athlete_id, value) in enumerate(top, start=1)
+            ]
+        })
+
+
+class RollupSeriesView(APIView):
+    scope = 'athlete'
+
+    def get(self, request, user_id):
+        user = get_object_or_404(User, id=user_id, is_superuser=False)
+        if user.is_staff != (self.scope == 'coach'):
+            return Response({ 'message': f'User instance with ID: {user_id} has invalid type.' }, status=400)
+        period = request.query_params.get('period', 'week')
+        if period not in PERIODS:
+            raise ValidationError({'period': f'Has to be one of: {", ".join(PERIODS)}.'})
+        start, end = get_analytics_range(request)
+        series = get_series(period, start, end, **{f'{self.scope}_id': user.id})
+        return Response({'period': period, self.scope: user.id, 'series': series})
+
+
+class ImportJobView(APIView):
+    def get(self, request, job_id):
+        job = get_object_or_404(ImportJob, id=job_id)
+        return Response(ImportJobSerializer(job).data)
\ No newline at end of file
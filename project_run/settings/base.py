@@ -74,6 +74,18 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'project_run.wsgi.application'
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -111,6 +123,9 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = 'static'
 
+# Uploaded files; collectible item imports are always kept on the local filesystem
+MEDIA_ROOT = BASE_DIR / 'media'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -119,3 +134,27 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 COMPANY_NAME = 'Runners for the values'
 SLOGAN = 'Anywhere, anytime, anywhat...'
 CONTACTS = 'city-district-country'
+
+RUN_STATE_CACHE = 'default'
+RUN_STATE_TIMEOUT = 6 * 60 * 60
+
+COLLECTED_ITEMS_TIMEOUT = 5 * 60
+
+GEO_ENGINE = 'geodesic'
+
+POSITION_INGEST_MODE = 'sync'
+POSITION_FLUSH_BATCH_SIZE = 1000
+
+SIMPLIFIED_TRACK_TIMEOUT = 24 * 60 * 60
+SIMPLIFY_TOLERANCES = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+COACH_ANALYTICS_TIMEOUT = 60 * 60
+
+CHALLENGES_SUMMARY_TIMEOUT = 60 * 60
+
+COLLECTIBLE_ITEM_IMPORT_MODE = 'async'
+COLLECTIBLE_ITEM_IMPORT_BATCH_SIZE = 2000
+
+LEADERBOARD_BACKEND = 'local'
+LEADERBOARD_LOCAL_TIMEOUT = 5 * 60
+LEADERBOARD_REDIS_URL = 'redis://localhost:6379/0'